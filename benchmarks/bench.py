@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Parse / render / write throughput and peak memory for each converter.
+
+Record a baseline, then compare later runs against it:
+
+    python3 benchmarks/bench.py --entries 100000 --save benchmarks/baseline.json
+    python3 benchmarks/bench.py --entries 100000 --compare benchmarks/baseline.json
+
+--compare exits with status 1 if any metric regressed by more than
+--threshold (default 15%).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from gen_export import generate
+
+CONVERTERS = ("remmina", "putty", "rabbit")
+# metric -> True if higher is better
+METRICS = {"parse_eps": True, "render_eps": True, "write_eps": True, "peak_kib": False}
+
+def make_backend(conv: str, root: str):
+    import moba2putty, moba2rabbit, moba2remmina
+    if conv == "remmina":
+        return moba2remmina.RemminaBackend(os.path.join(root, "remmina"))
+    if conv == "putty":
+        return moba2putty.PuttyBackend(Path(root) / "putty")
+    etc, share = os.path.join(root, "etc"), os.path.join(root, "share")
+    os.makedirs(etc, exist_ok=True)
+    fav_ini = os.path.join(etc, "Favorite.ini")
+    with open(fav_ini, "w", encoding="utf-8") as f:
+        f.write("[General]\nRootCount=0\n")
+    return moba2rabbit.RabbitBackend(fav_ini, share)
+
+def render_fn(conv: str):
+    import moba2putty, moba2rabbit, moba2remmina
+    if conv == "remmina":
+        return moba2remmina.render_profile
+    if conv == "putty":
+        target = Path("/nonexistent")
+        return lambda e: moba2putty.write_session(e, target)
+    return lambda e: moba2rabbit.make_rrc_telnet(e) if e.protocol == "TELNET" else moba2rabbit.make_rrc_ssh(e)
+
+def best_of(repeat: int, fn) -> float:
+    """Run fn() repeat times and return the fastest wall time."""
+    best = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def bench_converter(conv: str, src: str, lines: list[str], workdir: str, repeat: int) -> dict:
+    from moba_common import iter_entries, read_entries, run_backends
+
+    entries = list(iter_entries(lines))
+    n = len(entries)
+    parse = best_of(repeat, lambda: list(iter_entries(lines)))
+
+    render = render_fn(conv)
+    render_s = best_of(repeat, lambda: [render(e) for e in entries])
+
+    def write_all():
+        root = tempfile.mkdtemp(dir=workdir)
+        run_backends(entries, [make_backend(conv, root)])
+        shutil.rmtree(root)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        write_s = best_of(repeat, write_all)
+
+        # peak memory of the whole streaming pipeline, file to disk
+        root = tempfile.mkdtemp(dir=workdir)
+        tracemalloc.start()
+        run_backends(read_entries(src), [make_backend(conv, root)])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        shutil.rmtree(root)
+
+    return {
+        "entries": n,
+        "parse_eps": round(n / parse, 1) if parse else 0.0,
+        "render_eps": round(n / render_s, 1) if render_s else 0.0,
+        "write_eps": round(n / write_s, 1) if write_s else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"{'converter':<10} {'metric':<11} {'baseline':>12} {'current':>12} {'change':>8}")
+    for conv, metrics in new["results"].items():
+        old = base.get("results", {}).get(conv)
+        if not old:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            a, b = old.get(metric), metrics.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{conv}.{metric}")
+            print(f"{conv:<10} {metric:<11} {a:>12.1f} {b:>12.1f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the MobaXterm converters.")
+    ap.add_argument("-i", "--input", help="Benchmark this export instead of a generated one")
+    ap.add_argument("-e", "--entries", type=int, default=10000, help="Generated bookmarks (default: 10000)")
+    ap.add_argument("-g", "--groups", type=int, default=100, help="Generated groups (default: 100)")
+    ap.add_argument("--telnet-ratio", type=float, default=0.1)
+    ap.add_argument("--key-ratio", type=float, default=0.5)
+    ap.add_argument("--field-variance", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("-c", "--converters", default=",".join(CONVERTERS),
+                    help="Comma-separated converters to run (default: remmina,putty,rabbit)")
+    ap.add_argument("-r", "--repeat", type=int, default=3,
+                    help="Take the best of this many runs for each throughput figure (default: 3)")
+    ap.add_argument("--save", metavar="JSON", help="Write results as a JSON baseline")
+    ap.add_argument("--compare", metavar="JSON", help="Compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.15,
+                    help="Relative change counted as a regression (default: 0.15)")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="moba-bench-")
+    # keep the backends' manifests out of the real state directory
+    os.environ["XDG_STATE_HOME"] = os.path.join(workdir, "state")
+    try:
+        if args.input:
+            src = args.input
+            params = {"input": os.path.abspath(src)}
+        else:
+            src = os.path.join(workdir, "export.txt")
+            params = {"entries": args.entries, "groups": args.groups, "telnet_ratio": args.telnet_ratio,
+                      "key_ratio": args.key_ratio, "field_variance": args.field_variance, "seed": args.seed}
+            with open(src, "w", encoding="utf-8") as f:
+                for line in generate(args.entries, args.groups, args.telnet_ratio, args.key_ratio,
+                                     args.field_variance, args.seed):
+                    f.write(line + "\n")
+        with open(src, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        results = {}
+        for conv in [c.strip() for c in args.converters.split(",") if c.strip()]:
+            if conv not in CONVERTERS:
+                ap.error(f"unknown converter: {conv}")
+            results[conv] = bench_converter(conv, src, lines, workdir, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    params["repeat"] = args.repeat
+    report = {"version": 1, "python": platform.python_version(), "params": params, "results": results}
+    print(f"{'converter':<10} {'entries':>9} {'parse/s':>11} {'render/s':>11} {'write/s':>11} {'peak KiB':>10}")
+    for conv, r in results.items():
+        print(f"{conv:<10} {r['entries']:>9} {r['parse_eps']:>11.0f} {r['render_eps']:>11.0f} "
+              f"{r['write_eps']:>11.0f} {r['peak_kib']:>10.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("params") != params:
+            print("Warning: baseline was recorded with different parameters", file=sys.stderr)
+        print()
+        regressions = compare(base, report, args.threshold)
+        if regressions:
+            print(f"Regressions above {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
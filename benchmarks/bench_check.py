@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""--check against local stand-ins: loopback listeners and a hosts file.
+
+    python3 benchmarks/bench_check.py --entries 10000
+
+A third of the generated bookmarks point at names that resolve (through a
+hosts-format file, as with --check-hosts) to a loopback port with a
+listener, a third at a loopback port without one, and a third at names the
+file does not know. The export is checked with --check tag and every
+bookmark's outcome is compared with what its host was set up to do: the
+script exits with status 1 on any mismatch, so it doubles as a check of
+moba_check without a network.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+KINDS = ("up", "down", "gone")   # listening, refused, not in the hosts file
+
+def free_ports(n: int) -> list[int]:
+    """n loopback ports that nothing listens on (bound and released)."""
+    socks = [socket.socket() for _ in range(n)]
+    for s in socks:
+        s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in socks]
+    for s in socks:
+        s.close()
+    return ports
+
+def start_listeners(count: int) -> tuple[list[int], asyncio.AbstractEventLoop]:
+    """count listeners on 127.0.0.1 that accept and close, on a thread of their own."""
+    loop = asyncio.new_event_loop()
+    ports, ready = [], threading.Event()
+
+    async def serve():
+        async def client(reader, writer):
+            writer.close()
+        for _ in range(count):
+            server = await asyncio.start_server(client, "127.0.0.1", 0, backlog=1024)
+            ports.append(server.sockets[0].getsockname()[1])
+        ready.set()
+
+    threading.Thread(target=lambda: (loop.run_until_complete(serve()), loop.run_forever()), daemon=True).start()
+    ready.wait()
+    return ports, loop
+
+def make_fixture(entries: int, hosts: int, up_ports: list[int], down_ports: list[int], tmp: str):
+    """(export path, hosts file path, {(group, name): kind})."""
+    expected = {}
+    lines = []
+    with open(os.path.join(tmp, "hosts"), "w", encoding="utf-8") as f:
+        f.write("# generated by bench_check.py\n")
+        for h in range(hosts):
+            if KINDS[h % 3] != "gone":
+                f.write(f"127.0.0.1 {KINDS[h % 3]}{h}.standin.test\n")
+    for g in range(max(1, entries // 100)):
+        lines += ["", f"[Bookmarks_{g + 1}]", f"SubRep=Site {g:03d}", "ImgNum=41"]
+        for i in range(g * 100, min(entries, (g + 1) * 100)):
+            h = i % hosts
+            kind = KINDS[h % 3]
+            port = (up_ports if kind == "up" else down_ports)[h % len(up_ports)]
+            lines.append(f"node{i}=#109#0%{kind}{h}.standin.test%{port}%ops%%-1%-1%%%%0%0%0%")
+            expected[(f"Site {g:03d}", f"node{i}")] = kind
+    with open(os.path.join(tmp, "export.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return os.path.join(tmp, "export.txt"), os.path.join(tmp, "hosts"), expected
+
+def main():
+    from moba_check import DEFAULT_CONCURRENCY, Checker, check_entries, read_hosts_file, tag_group
+    from moba_common import read_entries
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--entries", type=int, default=10_000)
+    ap.add_argument("--hosts", type=int, default=3_000, help="distinct host names (default: 3000)")
+    ap.add_argument("--listeners", type=int, default=16, help="loopback ports with a listener (default: 16)")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--timeout", type=float, default=2.0)
+    args = ap.parse_args()
+
+    up_ports, loop = start_listeners(args.listeners)
+    down_ports = free_ports(args.listeners)
+    with tempfile.TemporaryDirectory() as tmp:
+        export, hosts, expected = make_fixture(args.entries, args.hosts, up_ports, down_ports, tmp)
+        checker = Checker(args.concurrency, args.timeout, read_hosts_file(hosts))
+        t0 = time.perf_counter()
+        result = list(check_entries(read_entries(export), checker, "tag"))
+        elapsed = time.perf_counter() - t0
+    loop.call_soon_threadsafe(loop.stop)
+
+    wrong = []
+    for e in result:
+        group = e.group.rpartition("\\")[2]
+        kind = expected.get((group, e.name))
+        tagged = e.group == tag_group(group)
+        if kind is None or tagged != (kind != "up"):
+            wrong.append(f"{e.group}/{e.name} -> {e.host}:{e.port} ({kind})")
+    missing = len(expected) - len(result)
+    print(f"{len(result)} entries, {args.hosts} hosts checked in {elapsed:.2f}s; "
+          f"{len(wrong)} wrong, {missing} missing")
+    for line in wrong[:10]:
+        print(f"  wrong: {line}")
+    sys.exit(1 if wrong or missing else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Peak memory and speed of EntryStore against a list of Entry tuples.
+
+    python3 benchmarks/bench_store.py --entries 1000000
+
+Both sides are built from the same generated export, streamed line by line,
+so the peak is what holding the entries costs (tracemalloc). Filter and sort
+times are measured in a separate run without tracing.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from gen_export import generate
+
+def entries(args):
+    from moba_common import iter_entries
+    return iter_entries(generate(args.entries, args.groups, args.telnet_ratio, args.key_ratio,
+                                 args.field_variance, args.seed))
+
+def build(kind: str, args):
+    from moba_store import EntryStore
+    return EntryStore(entries(args)) if kind == "store" else list(entries(args))
+
+def peak_memory(kind: str, args) -> tuple[int, int]:
+    """(peak bytes while building, bytes still held afterwards)."""
+    gc.collect()
+    tracemalloc.start()
+    held = build(kind, args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return peak, current
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def speed(kind: str, args) -> dict:
+    t0 = time.perf_counter()
+    held = build(kind, args)
+    built = time.perf_counter() - t0
+    pick = lambda g: g is not None and g.endswith("7")
+    if kind == "store":
+        select = lambda: held.where(protocol="SSH", group=pick)
+        order = lambda: held.order_by("group", "user", "name")
+        scan = lambda: sum(1 for _ in held)
+    else:
+        select = lambda: [i for i, e in enumerate(held) if e.protocol == "SSH" and pick(e.group)]
+        order = lambda: sorted(range(len(held)), key=lambda i: (held[i].group or "", held[i].user, held[i].name))
+        scan = lambda: sum(1 for _ in held)
+    return {"build_s": round(built, 3), "filter_s": round(timed(select), 3),
+            "sort_s": round(timed(order), 3), "iterate_s": round(timed(scan), 3)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare EntryStore with a list of Entry tuples.")
+    ap.add_argument("-e", "--entries", type=int, default=1000000, help="Generated bookmarks (default: 1000000)")
+    ap.add_argument("-g", "--groups", type=int, default=500, help="Generated groups (default: 500)")
+    ap.add_argument("--telnet-ratio", type=float, default=0.1)
+    ap.add_argument("--key-ratio", type=float, default=0.5)
+    ap.add_argument("--field-variance", type=int, default=8)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = ap.parse_args()
+
+    results = {}
+    for kind in ("tuples", "store"):
+        peak, held = peak_memory(kind, args)
+        results[kind] = {"peak_mib": round(peak / 2**20, 1), "held_mib": round(held / 2**20, 1),
+                         "bytes_per_entry": round(held / args.entries, 1), **speed(kind, args)}
+
+    if args.json:
+        json.dump({"entries": args.entries, "results": results}, sys.stdout, indent=2)
+        print()
+        return
+    cols = ("peak_mib", "held_mib", "bytes_per_entry", "build_s", "filter_s", "sort_s", "iterate_s")
+    print(f"{args.entries} entries")
+    print(f"{'':<8} " + " ".join(f"{c:>15}" for c in cols))
+    for kind, r in results.items():
+        print(f"{kind:<8} " + " ".join(f"{r[c]:>15}" for c in cols))
+    ratio = results["tuples"]["peak_mib"] / results["store"]["peak_mib"]
+    print(f"store peak is {1 / ratio:.0%} of the tuples' ({ratio:.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Generate a synthetic MobaXterm bookmarks export for benchmarking.
+
+Example:
+    python3 benchmarks/gen_export.py --entries 100000 --groups 500 -o /tmp/big.txt
+"""
+import argparse
+import random
+import sys
+
+def generate(entries: int, groups: int, telnet_ratio: float, key_ratio: float,
+             field_variance: int, seed: int):
+    """Yield the lines of a synthetic export."""
+    rnd = random.Random(seed)
+    users = [f"user{i}" for i in range(max(1, groups // 4) + 1)]
+    keys = ["id_ed25519", "id_rsa", "deploy_key", "ops_ed25519"]
+    groups = max(1, groups)
+
+    yield "[Bookmarks]"
+    yield "SubRep="
+    yield "ImgNum=42"
+    for g in range(groups):
+        lo, hi = entries * g // groups, entries * (g + 1) // groups
+        yield ""
+        yield f"[Bookmarks_{g + 1}]"
+        yield f"SubRep=Group {g:04d}"
+        yield "ImgNum=41"
+        for i in range(lo, hi):
+            user = rnd.choice(users) if rnd.random() < 0.9 else ""
+            if rnd.random() < telnet_ratio:
+                fields = ["#98#1", f"sw{i}.net.example", "23", user, "", "-1", "-1", "", "", "", "0", "0", "0"]
+            else:
+                key = f"_ProfileDir_\\.ssh\\{rnd.choice(keys)}" if rnd.random() < key_ratio else ""
+                fields = ["#109#0", f"host{i}.example", rnd.choice(["22", "22", "22", "2222"]), user,
+                          "", "-1", "-1", "", "", "22", "", "0", "0", "0", key, "", "-1", "0", "0", "0"]
+            # exports from different MobaXterm versions carry a varying number of trailing fields
+            fields += ["0"] * rnd.randint(0, field_variance)
+            yield f"host-{i:07d}=" + "%".join(fields) + "%"
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic MobaXterm bookmarks export.")
+    ap.add_argument("-e", "--entries", type=int, default=10000, help="Number of bookmarks (default: 10000)")
+    ap.add_argument("-g", "--groups", type=int, default=100, help="Number of [Bookmarks_N] groups (default: 100)")
+    ap.add_argument("--telnet-ratio", type=float, default=0.1, help="Fraction of Telnet entries (default: 0.1)")
+    ap.add_argument("--key-ratio", type=float, default=0.5, help="Fraction of SSH entries with a key path (default: 0.5)")
+    ap.add_argument("--field-variance", type=int, default=8,
+                    help="Up to this many extra trailing fields per entry (default: 8)")
+    ap.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    ap.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = ap.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for line in generate(args.entries, args.groups, args.telnet_ratio, args.key_ratio,
+                             args.field_variance, args.seed):
+            out.write(line + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Convert one MobaXterm export into several clients in a single pass.
+
+The export is read and parsed once; every Entry is streamed to each selected
+backend (Remmina, PuTTY, Rabbit, OpenSSH) before the next line is read.
+"""
+import sys, argparse
+from contextlib import nullcontext
+
+from moba_bundle import add_bundle_args, open_bundle
+from moba_cache import add_cache_args
+from moba_check import add_check_args
+from moba_common import add_common_args, require_file
+from moba_filter import add_filter_args, selection_from_args
+from moba_manifest import add_sync_args
+from moba_parallel import add_parallel_args, check_parallel_args, run_export
+from moba_pipe import add_pipe_args, dump_entries, open_pipe
+from moba_stats import Stats, add_stats_args, profiling
+from moba_watch import add_watch_args, watch_export
+from moba_writer import ProfileWriter, add_writer_args
+import moba2putty
+import moba2rabbit
+import moba2remmina
+import moba2ssh
+
+TARGETS = ("remmina", "putty", "rabbit", "ssh")
+# ssh edits ~/.ssh/config, so it is only written when asked for
+DEFAULT_TARGETS = ("remmina", "putty", "rabbit")
+
+def parse_targets(value: str) -> list[str]:
+    targets = [t.strip().lower() for t in value.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown or not targets:
+        raise argparse.ArgumentTypeError(f"invalid targets {value!r} (choose from {', '.join(TARGETS)})")
+    # keep the order given, drop duplicates
+    return list(dict.fromkeys(targets))
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Convert MobaXterm bookmarks to Remmina, PuTTY and Rabbit in one pass."
+    )
+    add_common_args(ap)
+    add_filter_args(ap)
+    add_check_args(ap)
+    add_cache_args(ap)
+    add_parallel_args(ap)
+    add_sync_args(ap)
+    add_writer_args(ap)
+    add_stats_args(ap)
+    add_watch_args(ap)
+    add_bundle_args(ap)
+    add_pipe_args(ap)
+    ap.add_argument("-t", "--targets", type=parse_targets, default=list(DEFAULT_TARGETS),
+                    help=f"Comma-separated backends to write, from {','.join(TARGETS)} "
+                         f"(default: {','.join(DEFAULT_TARGETS)})")
+    # PuTTY target selection; dest names match what moba2putty.detect_target() expects
+    ap.add_argument("--putty-target", dest="target", help="Override PuTTY sessions directory")
+    ap.add_argument("--putty-native", dest="native", action="store_true", help="Force native PuTTY path")
+    ap.add_argument("--putty-flatpak", dest="flatpak", action="store_true", help="Force Flatpak PuTTY path")
+    ap.add_argument("--putty-all-dirs", dest="all_dirs", action="store_true",
+                    help="Update every installed PuTTY's sessions directory, hard-linking the files")
+    args = ap.parse_args()
+
+    pipe = open_pipe(ap, args)
+    bundle = open_bundle(ap, args) or pipe
+    if "rabbit" in args.targets and not bundle and args.ndjson != "entries":
+        moba2rabbit.require_rabbit_paths()
+    require_file(args.src_file)
+    select = selection_from_args(args)
+    check_parallel_args(ap, args)
+    if args.ndjson == "entries":
+        dump_entries(args, select)
+        return
+    putty_dir, putty_mirrors = moba2putty.detect_targets(ap, args)
+
+    def writer():
+        # --archive: one archive, each backend appending its own members
+        return bundle.writer() if bundle else ProfileWriter(args.write_jobs, args.fsync)
+
+    favorites = {}   # Rabbit's Favorite.ini and .rrc index, from one --watch pass to the next
+
+    def make_backends():
+        backends = []
+        for t in args.targets:
+            if t == "remmina":
+                backends.append(moba2remmina.RemminaBackend(moba2remmina.DEST_DIR, args.dry_run,
+                                                             args.force, args.prune, writer()))
+            elif t == "putty":
+                backends.append(moba2putty.PuttyBackend(putty_dir, args.dry_run, args.force, args.prune,
+                                                         writer(), mirrors=putty_mirrors))
+            elif t == "rabbit":
+                backends.append(moba2rabbit.RabbitBackend(moba2rabbit.FAV_INI, moba2rabbit.SHARE_DIR,
+                                                           args.dry_run, writer(), favorites=favorites))
+            elif t == "ssh":
+                backends.append(moba2ssh.SshBackend(moba2ssh.SSH_DIR, args.dry_run, args.force, args.prune,
+                                                    writer()))
+        return backends
+
+    def report(backends, parse_time=None, timings=None):
+        # --watch passes no timings: the table then has no seconds column
+        cols = ("created", "updated", "unchanged", "removed", "skipped")
+        secs = timings is not None
+        print(f"{'backend':<10} " + " ".join(f"{c:>9}" for c in cols) + (f" {'seconds':>9}" if secs else ""))
+        if secs:
+            print(f"{'(parse)':<10} " + " ".join(f"{'':>9}" for c in cols) + f" {parse_time:>9.3f}")
+        for b in backends:
+            m = getattr(b, "manifest", b)
+            counts = [getattr(m, c, 0) for c in cols[:-1]] + [b.skipped]
+            print(f"{b.name:<10} " + " ".join(f"{n:>9}" for n in counts) + (f" {timings[b.name]:>9.3f}" if secs else ""))
+        for b in backends:
+            for m in getattr(b, "mirrors", ()):
+                print(f"{b.name} mirrored into {m.target_dir}: {m.summary()}")
+        if args.dry_run:
+            print("Dry-run only: no files written.")
+
+    if args.watch:
+        watch_export(args, make_backends, report)
+        return
+
+    with bundle or nullcontext():
+        backends = make_backends()
+        stats = Stats() if args.stats else None
+        with profiling(args.profile):
+            parse_time, timings = run_export(args, backends, select, stats)
+        if stats:
+            stats.finish()
+
+        report(backends, parse_time, timings)
+        if bundle:
+            print(bundle.summary())
+    if stats:
+        stats.report(args.stats)
+    if any(b.failed for b in backends):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Convert many users' exports into many home directories on a process pool.
+
+The job list is a CSV file, one job per line:
+
+    # export,home,targets
+    exports/alice.txt,/home/alice,remmina,putty
+    exports/bob.txt,/srv/image/home/bob
+
+``home`` is the home directory (or any prefix laid out like one) that the
+profiles go under; the default client directories and ``_ProfileDir_`` key
+paths are resolved against it. ``targets`` is optional (default: remmina,putty,rabbit) and
+may use the remaining columns. Relative export and home paths are relative
+to the job list. Each job parses its export once and streams it to all of its
+backends, like moba2all.py; a failing job or backend is reported in the
+result table and the other jobs keep going.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import NamedTuple
+
+from moba_cache import ParseCache, add_cache_args
+from moba_common import open_entries, run_backends
+from moba_manifest import add_sync_args
+from moba_writer import ProfileWriter, add_writer_args
+from moba2all import DEFAULT_TARGETS, parse_targets
+import moba2putty
+import moba2rabbit
+import moba2remmina
+import moba2ssh
+
+class Job(NamedTuple):
+    line: int
+    export: str
+    home: str
+    targets: list[str]
+
+class JobResult(NamedTuple):
+    line: int
+    export: str
+    home: str
+    backend: str
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+def read_jobs(path: str) -> list[Job]:
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for n, row in enumerate(csv.reader(f), 1):
+            row = [c.strip() for c in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            if len(row) < 2 or not row[1]:
+                raise ValueError(f"{path}:{n}: expected export,home[,targets]")
+            try:
+                targets = parse_targets(",".join(row[2:])) if any(row[2:]) else list(DEFAULT_TARGETS)
+            except argparse.ArgumentTypeError as exc:
+                raise ValueError(f"{path}:{n}: {exc}") from None
+            export, home = (os.path.abspath(os.path.join(base, os.path.expanduser(c))) for c in row[:2])
+            jobs.append(Job(n, export, home, targets))
+    return jobs
+
+def make_backend(target: str, home: str, opts: dict, writer=None):
+    """A quiet backend for target writing under home; writer defaults to a
+    ProfileWriter per opts (moba_daemon passes archive writers)."""
+    writer = writer or ProfileWriter(opts["write_jobs"], opts["fsync"])
+    if target == "remmina":
+        return moba2remmina.RemminaBackend(moba2remmina.default_dest_dir(home), opts["dry_run"],
+                                           opts["force"], opts["prune"], writer, verbose=False)
+    if target == "putty":
+        return moba2putty.PuttyBackend(moba2putty.flatpak_sessions_dir(home), opts["dry_run"],
+                                       opts["force"], opts["prune"], writer, verbose=False)
+    if target == "ssh":
+        return moba2ssh.SshBackend(moba2ssh.default_ssh_dir(home), opts["dry_run"], opts["force"],
+                                   opts["prune"], writer, verbose=False, home=home)
+    rabbit_dir = moba2rabbit.default_rabbit_dir(home)
+    return moba2rabbit.RabbitBackend(f"{rabbit_dir}/etc/Favorite.ini", f"{rabbit_dir}/share",
+                                     opts["dry_run"], writer, verbose=False)
+
+def error_text(exc: BaseException) -> str:
+    if isinstance(exc, OSError) and exc.strerror:
+        return f"{exc.strerror}: {exc.filename}" if exc.filename else exc.strerror
+    return f"{type(exc).__name__}: {exc}"
+
+def run_job(job: Job, opts: dict) -> list[JobResult]:
+    """Run one job in a worker process; never raises."""
+    rows, backends = [], []
+    for t in job.targets:
+        try:
+            backends.append(make_backend(t, job.home, opts))
+        except Exception as exc:
+            rows.append(JobResult(job.line, job.export, job.home, t, error=error_text(exc)))
+    if not backends:
+        return rows
+    try:
+        # jobs sharing an export parse it once between them (the cache is on disk)
+        cache = ParseCache(max_bytes=opts["cache_size"] << 20) if opts["cache"] else None
+        _, timings = run_backends(open_entries(job.export, home=job.home, cache=cache), backends)
+    except Exception as exc:
+        # unreadable export (or a backend failing half way): the job as a whole failed
+        return rows + [JobResult(job.line, job.export, job.home, b.name, error=error_text(exc)) for b in backends]
+    for b in backends:
+        r = b.result()
+        rows.append(JobResult(job.line, job.export, job.home, b.name, r.created, r.updated, r.unchanged,
+                              r.removed, r.skipped, len(r.failed), round(timings[b.name], 3),
+                              f"{len(r.failed)} write(s) failed" if r.failed else None))
+    return rows
+
+def run_jobs(jobs: list[Job], opts: dict, workers: int) -> list[JobResult]:
+    """Run jobs on a pool of worker processes; rows come back in job order."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    results: dict[int, list[JobResult]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, opts): job for job in jobs}
+        for done, fut in enumerate(as_completed(futures), 1):
+            job = futures[fut]
+            try:
+                rows = fut.result()
+            except Exception as exc:   # the worker process itself died
+                rows = [JobResult(job.line, job.export, job.home, "-", error=error_text(exc))]
+            results[job.line] = rows
+            status = "ok" if not any(r.error for r in rows) else "FAILED"
+            print(f"[{done}/{len(jobs)}] {job.export} -> {job.home}: {status}", file=sys.stderr)
+    return [r for job in jobs for r in results[job.line]]
+
+def print_table(rows: list[JobResult]) -> None:
+    cols = ("created", "updated", "unchanged", "removed", "skipped", "failed")
+    print(f"{'line':>5} {'backend':<8} " + " ".join(f"{c:>9}" for c in cols) + f" {'seconds':>8}  home / error")
+    for r in rows:
+        counts = " ".join(f"{getattr(r, c):>9}" for c in cols)
+        print(f"{r.line:>5} {r.backend:<8} {counts} {r.seconds:>8.3f}  {r.home}")
+        if r.error:
+            print(f"{'':>5} {'':<8} error: {r.error}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert many MobaXterm exports into many home directories.")
+    ap.add_argument("joblist", help="CSV job list: export,home[,targets]")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                    help="Worker processes (default: number of CPUs)")
+    ap.add_argument("-n", "--dry-run", action="store_true", help="Count what would change without writing")
+    ap.add_argument("--json", action="store_true", help="Print the result table as JSON")
+    add_sync_args(ap)
+    add_writer_args(ap)
+    add_cache_args(ap)
+    args = ap.parse_args()
+
+    try:
+        jobs = read_jobs(args.joblist)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        sys.exit(2)
+
+    opts = {"dry_run": args.dry_run, "force": args.force, "prune": args.prune,
+            "write_jobs": args.write_jobs, "fsync": args.fsync, "cache": args.cache, "cache_size": args.cache_size}
+    t0 = time.perf_counter()
+    rows = run_jobs(jobs, opts, max(1, args.jobs))
+    elapsed = time.perf_counter() - t0
+
+    if args.json:
+        json.dump([r._asdict() for r in rows], sys.stdout, indent=2)
+        print()
+    else:
+        print_table(rows)
+    failed = sorted({r.line for r in rows if r.error})
+    print(f"{len(jobs)} jobs in {elapsed:.2f}s on {max(1, args.jobs)} processes, {len(failed)} with errors.",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
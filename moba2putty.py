@@ -1,25 +1,30 @@
 #!/usr/bin/env python3
-import os, sys, argparse
+import os, sys, time, errno, shutil, argparse
+from contextlib import nullcontext
 from pathlib import Path
 from urllib.parse import quote
-from typing import NamedTuple
 
-HOME = str(Path.home())
+from moba_bundle import add_bundle_args, open_bundle
+from moba_cache import add_cache_args
+from moba_check import add_check_args
+from moba_common import (HOME, ConvertResult, Entry, EntryTemplate, Source, add_common_args, open_entries,
+                         require_file, run_backends)
+from moba_filter import add_filter_args, selection_from_args
+from moba_manifest import Manifest, add_sync_args, content_hash, entry_hash, manifest_path
+from moba_parallel import add_parallel_args, check_parallel_args, run_export
+from moba_pipe import add_pipe_args, dump_entries, open_pipe
+from moba_stats import Stats, add_stats_args, profiling
+from moba_watch import add_watch_args, watch_export
+from moba_writer import DEFAULT_JOBS, ProfileWriter, WriteResult, add_writer_args, fsync_dir, report_failures
 
 PUTTY_FLATPAK_APPID = "uk.org.greenend.chiark.sgtatham.putty"
-PUTTY_FLATPAK_SESS = Path(HOME) / f".var/app/{PUTTY_FLATPAK_APPID}/config/putty/sessions"
+def flatpak_sessions_dir(home: str | None = None) -> Path:
+    return Path(home or HOME) / f".var/app/{PUTTY_FLATPAK_APPID}/config/putty/sessions"
+
+PUTTY_FLATPAK_SESS = flatpak_sessions_dir()
 PUTTY_NATIVE_SESS = Path(os.getenv("XDG_CONFIG_HOME", f"{HOME}/.config")) / "putty" / "sessions"
 PUTTY_LEGACY_SESS = Path(HOME) / ".putty" / "sessions"
 
-class Entry(NamedTuple):
-    name: str
-    protocol: str   # SSH | TELNET
-    host: str
-    port: str
-    user: str
-    key_path: str
-    group: str | None
-
 def detect_target(args) -> Path:
     # 1) explicit wins
     if args.target:
@@ -36,48 +41,33 @@ def detect_target(args) -> Path:
     if args.flatpak:
         return PUTTY_FLATPAK_SESS
 
-    # 3) DEFAULT: Flatpak first (create if missing), else native, else legacy
-    return PUTTY_FLATPAK_SESS if True else PUTTY_NATIVE_SESS  # (always prefer Flatpak)
-
-def parse_line(name: str, rhs: str, group: str | None) -> Entry:
-    parts = rhs.split('%')
-    proto_code = parts[0] if parts else "#109#0"
-    if proto_code.startswith("#109"):
-        protocol, port_default = "SSH", "22"
-    elif proto_code.startswith("#98"):
-        protocol, port_default = "TELNET", "23"
-    else:
-        protocol, port_default = "SSH", "22"
-
-    host = parts[1] if len(parts) > 1 and parts[1] else ""
-    port = parts[2] if len(parts) > 2 and parts[2] else port_default
-    user = parts[3] if len(parts) > 3 and parts[3] else ""
-
-    key_path = ""
-    for p in parts:
-        if ".ssh" in p or "\\.ssh" in p:
-            key_path = p
-            break
-    if key_path:
-        key_path = key_path.replace("_ProfileDir_\\", "").replace("\\", "/")
-        if not key_path.startswith("/"):
-            key_path = f"{HOME}/{key_path}"
-
-    return Entry(
-        name=name.strip(),
-        protocol=protocol,
-        host=host.strip(),
-        port=port.strip(),
-        user=user.strip(),
-        key_path=key_path.strip(),
-        group=(group.strip() if group else None),
-    )
+    # 3) DEFAULT: Flatpak (created if missing); --all-dirs updates every installed one
+    return PUTTY_FLATPAK_SESS
+
+def detect_all_targets() -> list[Path]:
+    """The sessions directory of every PuTTY installed: Flatpak, native (XDG)
+    and legacy ~/.putty. The Flatpak one alone if none is."""
+    installed = [
+        (PUTTY_FLATPAK_SESS, Path(HOME) / ".var" / "app" / PUTTY_FLATPAK_APPID),
+        (PUTTY_NATIVE_SESS, PUTTY_NATIVE_SESS.parent),
+        (PUTTY_LEGACY_SESS, PUTTY_LEGACY_SESS.parent),
+    ]
+    return [d for d, marker in installed if marker.is_dir()] or [PUTTY_FLATPAK_SESS]
+
+def detect_targets(parser, args) -> tuple[Path, list[Path]]:
+    """(sessions directory, more directories to mirror it into) per the options."""
+    if not getattr(args, "all_dirs", False):
+        return detect_target(args), []
+    if args.target or args.native or args.flatpak or getattr(args, "archive", None):
+        parser.error("--all-dirs cannot be combined with another sessions directory option or --archive")
+    first, *rest = detect_all_targets()
+    return first, rest
 
 def putty_encode(name: str) -> str:
     # encode special chars for session filename
     return quote(name, safe="").replace("/", "%2F")
 
-def write_session(entry: Entry, target_dir: Path):
+def build_session(entry: Entry) -> str:
     settings = {
         "HostName": entry.host,
         "PortNumber": entry.port or ("22" if entry.protocol == "SSH" else "23"),
@@ -93,71 +83,275 @@ def write_session(entry: Entry, target_dir: Path):
     }
     if entry.protocol == "SSH" and entry.key_path:
         settings["PublicKeyFile"] = entry.key_path
+    # harmless metadata; the file name may be a disambiguated one (web-B)
+    settings["_ImportedName"] = entry.name
     if entry.group:
-        settings["_ImportedGroup"] = entry.group  # harmless metadata
+        settings["_ImportedGroup"] = entry.group
+
+    return "\n".join(f"{k}={v}" for k,v in settings.items()) + "\n"
+
+session_template = EntryTemplate(build_session)
+
+def write_session(entry: Entry, target_dir: Path):
+    return target_dir / putty_encode(entry.name), session_template(entry)
+
+def render_entry(e: Entry) -> tuple[str, str, str] | None:
+    """The part of PuttyBackend.add() that only depends on the entry: its
+    session file and the manifest hashes, or None if PuTTY can't open it."""
+    if e.protocol not in ("SSH", "TELNET"):
+        return None
+    content = session_template(e)
+    return content, entry_hash(e), content_hash(content)
+
+def link_or_copy(src: str, dst: str, fsync: bool = False) -> str:
+    """Replace dst with a hard link to src, or a copy of it across file
+    systems. Returns "linked" or "copied"."""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return "linked"
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.tmp")
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, tmp)
+        how = "linked"
+    except OSError as exc:
+        # EXDEV: another file system; EPERM/EMLINK: no (more) links there
+        if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(src, tmp)
+        if fsync:
+            with open(tmp, "rb") as f:
+                os.fsync(f.fileno())
+        how = "copied"
+    os.replace(tmp, dst)
+    return how
+
+class SessionMirror:
+    """Another sessions directory a PuttyBackend keeps in step (--all-dirs).
+
+    It has its own manifest and file names; its files are hard links to the
+    copy written in the first directory that needed it.
+    """
+    def __init__(self, target_dir: Path, force: bool = False, dry_run: bool = False):
+        self.target_dir = target_dir
+        self.manifest = Manifest(manifest_path("putty", target_dir), target_dir, force)
+        self.names = self.manifest.name_index()
+        self.links: list[tuple[str, str]] = []   # (source, destination), made in close()
+        self.written = self.linked = self.copied = 0
+        self.failed: list[WriteResult] = []
+        if not dry_run:
+            target_dir.mkdir(parents=True, exist_ok=True)
+
+    def summary(self) -> str:
+        return (f"{self.manifest.summary()} (written: {self.written}, linked: {self.linked}, "
+                f"copied: {self.copied})")
+
+class PuttyBackend:
+    name = "putty"
+
+    def __init__(self, target_dir: Path, dry_run: bool = False,
+                 force: bool = False, prune: bool = False, writer: ProfileWriter | None = None,
+                 verbose: bool = True, mirrors: list[Path] = ()):
+        """mirrors: more sessions directories to update in the same pass."""
+        self.target_dir = target_dir
+        self.dry_run = dry_run
+        self.prune = prune
+        self.verbose = verbose
+        self.skipped = 0
+        self.failed = []
+        self.writer = writer or ProfileWriter()
+        # archive output: a self-contained bundle, the local directory is left alone
+        local = self.writer.local
+        self.manifest = Manifest(manifest_path(self.name, target_dir) if local else None, target_dir, force)
+        self.names = self.manifest.name_index()
+        if local and not dry_run:
+            target_dir.mkdir(parents=True, exist_ok=True)
+        self.mirrors = [SessionMirror(d, force, dry_run) for d in mirrors] if local else []
+
+    @property
+    def created(self) -> int:
+        return self.manifest.created
+
+    # see RemminaBackend.render
+    render = staticmethod(render_entry)
 
-    path = target_dir / putty_encode(entry.name)
-    content = "\n".join(f"{k}={v}" for k,v in settings.items()) + "\n"
-    return path, content
+    def add(self, e: Entry) -> None:
+        self.add_rendered(e, render_entry(e))
+
+    def add_rendered(self, e: Entry, rendered: tuple[str, str, str] | None) -> None:
+        if rendered is None:
+            self.skipped += 1
+            return
+        content, *hashes = rendered
+        filename = self.names.claim(e.name, e.group, putty_encode)
+        source = None
+        if self.manifest.check(filename, e, content, self.names.exists(filename), hashes) != "unchanged":
+            source = self._write(self.target_dir / filename, content)
+        for m in self.mirrors:
+            name = m.names.claim(e.name, e.group, putty_encode)
+            if m.manifest.check(name, e, content, m.names.exists(name), hashes) == "unchanged":
+                continue
+            path = m.target_dir / name
+            if source is None:
+                # the first directory that needs the file writes it
+                source = self._write(path, content)
+                m.written += 1
+            elif self.dry_run:
+                if self.verbose:
+                    print(f"[dry-run] Would link {path} to {source}")
+            else:
+                m.links.append((source, str(path)))
+
+    def _write(self, path: Path, content: str) -> str:
+        if self.dry_run:
+            if self.verbose:
+                print(f"[dry-run] Would write {path}")
+                print(content.strip(), "\n")
+        else:
+            if self.mirrors:
+                # the writer rewrites in place: don't write through a link
+                # into a directory whose manifest expects the old content
+                try:
+                    if path.stat().st_nlink > 1:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
+            self.writer.write(path, content)
+        return str(path)
+
+    def close(self) -> None:
+        if self.verbose:
+            self.names.report()
+            for m in self.mirrors:
+                m.names.report()
+        self.failed = report_failures(self.writer.close())
+        dirs = {str(self.target_dir): self, **{str(m.target_dir): m for m in self.mirrors}}
+        for r in self.failed:
+            d = dirs[os.path.dirname(r.path)]
+            d.manifest.forget(os.path.basename(r.path))
+            if d is not self:
+                d.failed.append(r)
+        self._link()
+        if self.prune:
+            self.manifest.prune(self.dry_run, self.verbose)
+        if not self.dry_run:
+            self.manifest.save()
+        for m in self.mirrors:
+            m.manifest.scope = self.manifest.scope   # --watch: the same bookmarks were re-read
+            if self.prune:
+                m.manifest.prune(self.dry_run, self.verbose)
+            if not self.dry_run:
+                m.manifest.save()
+
+    def _link(self) -> None:
+        """Link (or copy) the files written by close() into the mirrors."""
+        not_written = {r.path for r in self.failed}
+        for m in self.mirrors:
+            failed = []
+            for src, dst in m.links:
+                t0 = time.perf_counter()
+                try:
+                    if src in not_written:
+                        raise OSError(errno.ENOENT, "its first copy could not be written")
+                    how = link_or_copy(src, dst, self.writer.fsync)
+                except OSError as exc:
+                    failed.append(WriteResult(dst, 0, time.perf_counter() - t0, exc))
+                    m.manifest.forget(os.path.basename(dst))
+                else:
+                    setattr(m, how, getattr(m, how) + 1)
+            if m.links and self.writer.fsync:
+                fsync_dir(str(m.target_dir))
+            m.links = []
+            m.failed += report_failures(failed)
+            self.failed += failed
+
+    def result(self) -> ConvertResult:
+        m = self.manifest
+        written = [r.path for r in self.writer.completed if r.error is None]
+        return ConvertResult(self.name, str(self.target_dir), m.created, m.updated, m.unchanged, m.removed,
+                             self.skipped, written, self.failed)
+
+def convert(source: Source, target_dir=None, *, groups=None, select=None, home: str | None = None,
+            cache=None, dry_run: bool = False, force: bool = False, prune: bool = False,
+            write_jobs: int = DEFAULT_JOBS, fsync: bool = False, verbose: bool = False) -> ConvertResult:
+    """Convert an export to PuTTY sessions in target_dir (default: home's Flatpak sessions directory).
+
+    Arguments as for moba2remmina.convert().
+    """
+    target = Path(target_dir) if target_dir else flatpak_sessions_dir(home)
+    backend = PuttyBackend(target, dry_run, force, prune, ProfileWriter(write_jobs, fsync), verbose)
+    run_backends(open_entries(source, groups, home, select, cache), [backend])
+    return backend.result()
 
 def main():
     ap = argparse.ArgumentParser(
         description="Convert MobaXterm bookmarks to PuTTY saved sessions (Flatpak by default)."
     )
-    ap.add_argument("-f","--file", dest="src_file", default="./moba_bookmarks.txt",
-                    help="Path to MobaXterm bookmarks export")
-    ap.add_argument("-n","--dry-run", action="store_true", help="Preview without writing files")
+    add_common_args(ap)
+    add_filter_args(ap)
+    add_check_args(ap)
+    add_cache_args(ap)
+    add_parallel_args(ap)
+    add_sync_args(ap)
+    add_writer_args(ap)
+    add_stats_args(ap)
     ap.add_argument("--target", help="Override target sessions directory")
     ap.add_argument("--native", action="store_true", help="Force native path (~/.putty/sessions)")
     ap.add_argument("--flatpak", action="store_true", help="Force Flatpak path (~/.var/app/.../config/putty/sessions)")
+    ap.add_argument("--all-dirs", action="store_true",
+                    help="Update the sessions directory of every PuTTY installed (Flatpak, native, legacy) "
+                         "in one pass, hard-linking the files")
+    add_watch_args(ap)
+    add_bundle_args(ap)
+    add_pipe_args(ap)
     args = ap.parse_args()
 
-    src = Path(args.src_file)
-    if not src.is_file():
-        print(f"Error: input file not found: {src}", file=sys.stderr); sys.exit(1)
+    require_file(args.src_file)
+    select = selection_from_args(args)
+    check_parallel_args(ap, args)
+    pipe = open_pipe(ap, args)
+    if args.ndjson == "entries":
+        dump_entries(args, select)
+        return
 
-    target_dir = detect_target(args)
-    if not args.dry_run:
-        target_dir.mkdir(parents=True, exist_ok=True)
+    target_dir, mirrors = detect_targets(ap, args)
+    bundle = open_bundle(ap, args) or pipe
 
-    created = 0
-    skipped = 0
-    current_group = None
+    def make_backends():
+        writer = bundle.writer() if bundle else ProfileWriter(args.write_jobs, args.fsync)
+        return [PuttyBackend(target_dir, args.dry_run, args.force, args.prune, writer, mirrors=mirrors)]
 
-    with src.open("r", encoding="utf-8") as f:
-        for raw_line in f:
-            line = raw_line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if line.startswith("[Bookmarks_"):
-                current_group = None; continue
-            if line.startswith("SubRep="):
-                current_group = line.split("=",1)[1].strip(); continue
-            if line.startswith("ImgNum="):
-                continue
-            if "=" not in line:
-                continue
+    def report(backends):
+        backend = backends[0]
+        print(f"{backend.manifest.summary()}, Skipped: {backend.skipped}")
+        print(f"Target directory: {target_dir}")
+        for m in backend.mirrors:
+            print(f"Mirrored into {m.target_dir}: {m.summary()}")
+        if args.dry_run:
+            print("Dry-run only: no files written.")
 
-            name, rhs = line.split("=", 1)
-            e = parse_line(name, rhs, current_group)
+    if args.watch:
+        watch_export(args, make_backends, report)
+        return
 
-            if e.protocol not in ("SSH", "TELNET"):
-                skipped += 1
-                continue
+    with bundle or nullcontext():
+        backends = make_backends()
+        backend = backends[0]
+        stats = Stats() if args.stats else None
+        with profiling(args.profile):
+            run_export(args, backends, select, stats)
+        if stats:
+            stats.finish()
 
-            path, content = write_session(e, target_dir)
-            if args.dry_run:
-                print(f"[dry-run] Would write {path}")
-                print(content.strip(), "\n")
-            else:
-                with path.open("w", encoding="utf-8") as out:
-                    out.write(content)
-            created += 1
-
-    print(f"Created: {created} sessions, Skipped: {skipped}")
-    print(f"Target directory: {target_dir}")
-    if args.dry_run:
-        print("Dry-run only: no files written.")
+        report(backends)
+        if bundle:
+            print(bundle.summary())
+    if stats:
+        stats.report(args.stats)
+    if backend.failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,81 +1,35 @@
 #!/usr/bin/env python3
 import os, re, sys, argparse
-from pathlib import Path
-from typing import NamedTuple
-
-HOME = str(Path.home())
-RABBIT_DIR = f"{HOME}/Documents/Rabbit/RabbitRemoteControl"
+from contextlib import nullcontext
+
+from moba_bundle import add_bundle_args, open_bundle
+from moba_cache import add_cache_args
+from moba_check import add_check_args
+from moba_common import (HOME, ConvertResult, Entry, EntryTemplate, Source, add_common_args, open_entries,
+                         require_file, run_backends)
+from moba_filter import add_filter_args, selection_from_args
+from moba_manifest import content_hash
+from moba_parallel import add_parallel_args, check_parallel_args, run_export
+from moba_pipe import add_pipe_args, dump_entries, open_pipe
+from moba_stats import Stats, add_stats_args, profiling
+from moba_watch import add_watch_args, file_signature, watch_export
+from moba_writer import DEFAULT_JOBS, ProfileWriter, add_writer_args, fsync_dir, report_failures
+
+def default_rabbit_dir(home: str | None = None) -> str:
+    return f"{home or HOME}/Documents/Rabbit/RabbitRemoteControl"
+
+RABBIT_DIR = default_rabbit_dir()
 FAV_INI   = f"{RABBIT_DIR}/etc/Favorite.ini"
 SHARE_DIR = f"{RABBIT_DIR}/share"
+# where an archive puts its .rrc files and Favorite.ini, for --merge-import
+IMPORT_DIR = f"{SHARE_DIR}/mobaxterm-import"
 
-class Entry(NamedTuple):
-    name: str
-    protocol: str
-    host: str
-    port: str
-    user: str
-    key_path: str
-    group: str | None
-
-parser = argparse.ArgumentParser(description="Convert MobaXterm bookmarks to Rabbit Remote Control favorites (SSH + Telnet), without prefixing names. Stores original group as metadata.")
-parser.add_argument("-f","--file", dest="src_file", default="./moba_bookmarks.txt",
-                    help="Path to MobaXterm bookmarks export (default: ./moba_bookmarks.txt)")
-parser.add_argument("-n","--dry-run", action="store_true", help="Preview without writing files")
-args = parser.parse_args()
-
-SRC_FILE = args.src_file
-DRY_RUN  = args.dry_run
-
-for needed in [FAV_INI, SHARE_DIR]:
-    if not os.path.exists(needed):
-        print(f"Error: expected Rabbit path not found: {needed}", file=sys.stderr)
-        print("Open Rabbit once, create a dummy connection, then close it.")
-        sys.exit(1)
-
-if not os.path.isfile(SRC_FILE):
-    print(f"Error: input file not found: {SRC_FILE}", file=sys.stderr)
-    sys.exit(1)
-
-def parse_line(name: str, rhs: str, group: str | None) -> Entry:
-    parts = rhs.split('%')
-    proto_code = parts[0] if parts else "#109#0"
-
-    if proto_code.startswith("#109"):
-        protocol = "SSH";    port_default = "22"
-    elif proto_code.startswith("#98"):
-        protocol = "TELNET"; port_default = "23"
-    else:
-        protocol = "SSH";    port_default = "22"
-
-    host = parts[1] if len(parts) > 1 and parts[1] else ""
-    port = parts[2] if len(parts) > 2 and parts[2] else port_default
-    user = parts[3] if len(parts) > 3 and parts[3] else ""
-
-    key_path = ""
-    for p in parts:
-        if ".ssh" in p or "\\.ssh" in p:
-            key_path = p
-            break
-    if key_path:
-        key_path = key_path.replace("_ProfileDir_\\", "").replace("\\", "/")
-        if not key_path.startswith("/"):
-            key_path = f"{HOME}/{key_path}"
-
-    return Entry(name=name.strip(), protocol=protocol, host=host.strip(),
-                 port=port.strip(), user=user.strip(), key_path=key_path.strip(),
-                 group=(group.strip() if group else None))
-
-def read_rootcount(fav_text: str) -> int:
-    m = re.search(r"^RootCount=(\d+)\s*$", fav_text, flags=re.M)
-    return int(m.group(1)) if m else 0
-
-def set_rootcount(fav_text: str, new_count: int) -> str:
-    if re.search(r"^RootCount=\d+\s*$", fav_text, flags=re.M):
-        return re.sub(r"^RootCount=\d+\s*$", f"RootCount={new_count}", fav_text, flags=re.M)
-    else:
-        if "[General]" in fav_text:
-            return fav_text.replace("[General]", f"[General]\nRootCount={new_count}")
-        return f"[General]\nRootCount={new_count}\n" + fav_text
+def require_rabbit_paths() -> None:
+    for needed in [FAV_INI, SHARE_DIR]:
+        if not os.path.exists(needed):
+            print(f"Error: expected Rabbit path not found: {needed}", file=sys.stderr)
+            print("Open Rabbit once, create a dummy connection, then close it.")
+            sys.exit(1)
 
 def sanitize_filename(name: str) -> str:
     return re.sub(r'[^A-Za-z0-9._-]+', "_", name).strip("_")
@@ -139,7 +93,7 @@ def make_rrc_user_block(user: str, key_path: str | None, is_ssh: bool) -> list[s
     u.append("")
     return u
 
-def make_rrc_ssh(entry: Entry) -> str:
+def build_rrc_ssh(entry: Entry) -> str:
     lines = make_rrc_common(entry.name, entry.group)
     lines.append("[Net]")
     lines.append(f"Host={entry.host}")
@@ -154,7 +108,7 @@ def make_rrc_ssh(entry: Entry) -> str:
     lines.extend(make_rrc_user_block(entry.user, entry.key_path, is_ssh=True))
     return "\n".join(lines)
 
-def make_rrc_telnet(entry: Entry) -> str:
+def build_rrc_telnet(entry: Entry) -> str:
     lines = make_rrc_common(entry.name, entry.group)
     lines.append("[Net]")
     lines.append(f"Host={entry.host}")
@@ -169,80 +123,455 @@ def make_rrc_telnet(entry: Entry) -> str:
     lines.extend(make_rrc_user_block(entry.user, None, is_ssh=False))
     return "\n".join(lines)
 
-def append_favorite(fav_text: str, idx: int, rrc_path: str, disp_name: str, group: str | None) -> str:
-    insertion = []
-    insertion.append(f"File_{idx}={rrc_path}")
-    insertion.append(f"Name_{idx}={disp_name}")
-    # Put a lightweight description that includes the group (searchable in Rabbit)
-    if group:
-        # keep it simple; no huge block like the stock SSH description
-        insertion.append(f'Descripte_{idx}="Group: {group}"')
-    insertion.append("")
-    return fav_text.rstrip() + "\n" + "\n".join(insertion) + "\n"
-
-with open(FAV_INI, "r", encoding="utf-8", errors="ignore") as f:
-    fav_text = f.read()
-
-rootcount = read_rootcount(fav_text)
-next_idx  = rootcount
-
-if not DRY_RUN:
-    os.makedirs(SHARE_DIR, exist_ok=True)
-
-created = 0
-skipped = 0
-
-with open(SRC_FILE, "r", encoding="utf-8") as f:
-    current_group = None  # <<< FIX: no stray underscore
-    for raw_line in f:
-        line = raw_line.rstrip("\n")
-        if not line or line.lstrip().startswith("#"):
-            continue
-        if line.startswith("[Bookmarks_"):
-            current_group = None
-            continue
-        if line.startswith("SubRep="):
-            current_group = line.split("=",1)[1].strip()
-            continue
-        if line.startswith("ImgNum="):
-            continue
-        if "=" in line:
-            name, rhs = line.split("=", 1)
-            e = parse_line(name, rhs, current_group)
-
-            # Use ONLY the raw bookmark name (no group prefix in visible name)
-            disp_name = e.name
-
-            if e.protocol == "SSH":
-                rrc_filename = f"SSH_SSH_{next_idx}_{sanitize_filename(disp_name)}.rrc"
-                content = make_rrc_ssh(e)
-            elif e.protocol == "TELNET":
-                rrc_filename = f"Telnet_Telnet_{next_idx}_{sanitize_filename(disp_name)}.rrc"
-                content = make_rrc_telnet(e)
-            else:
-                skipped += 1
-                print(f"Skipping unknown protocol entry: {disp_name} ({e.protocol})", file=sys.stderr)
+# what the backend calls: the builders above run once per entry shape
+make_rrc_ssh = EntryTemplate(build_rrc_ssh)
+make_rrc_telnet = EntryTemplate(build_rrc_telnet)
+
+def render_entry(e: Entry) -> tuple[str, str, str] | None:
+    """The part of RabbitBackend.add() that only depends on the entry:
+    (file name prefix, .rrc content, content hash), or None if unsupported."""
+    if e.protocol == "SSH":
+        prefix, content = "SSH_SSH", make_rrc_ssh(e)
+    elif e.protocol == "TELNET":
+        prefix, content = "Telnet_Telnet", make_rrc_telnet(e)
+    else:
+        return None
+    return prefix, content, content_hash(content)
+
+_FAV_KEY = re.compile(r"^(File|Name|Descripte)_(\d+)=(.*)$")
+
+def read_rrc_identity(rrc_path: str) -> tuple[str, str, str, str] | None:
+    """Return (host, port, user, content hash) of an existing .rrc, or None."""
+    try:
+        with open(rrc_path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    except OSError:
+        return None
+    return rrc_identity(text)
+
+def rrc_identity(text: str) -> tuple[str, str, str, str]:
+    host = port = user = ""
+    section = None
+    for line in text.splitlines():
+        if line.startswith("[") and line.endswith("]"):
+            section = line[1:-1]
+        elif section == "Net" and line.startswith("Host="):
+            host = line[5:]
+        elif section == "Net" and line.startswith("Port="):
+            port = line[5:]
+        elif section == "User" and line.startswith("Name="):
+            user = line[5:]
+    return host, port, user, content_hash(text)
+
+class FavoriteIni:
+    """Favorite.ini loaded once and indexed by favorite number and by
+    (name, host, port, user).
+
+    Existing ``File_N``/``Name_N``/``Descripte_N`` lines are edited in place,
+    new favorites are appended to the end of the ``[General]`` section, and
+    every other line is kept verbatim.
+    """
+
+    def __init__(self, text: str):
+        self.lines: list[str | None] = text.splitlines()
+        self.after: dict[int, list[str]] = {}       # line no -> lines inserted after it
+        self.new: dict[int, tuple[str, str, str | None]] = {}
+        self.fields: dict[int, dict[str, int]] = {}  # idx -> {"File": line no, ...}
+        self.by_key: dict[tuple[str, str, str, str], int] = {}
+        self.rrc_hash: dict[int, str] = {}
+
+        self.rootcount = 0
+        self.rootcount_line = None
+        self.general_header = None
+        self.append_at = 0        # new favorites go after the last non-blank [General] line
+        self.general_end = None   # first line after [General]
+
+        section = "General"  # keys before any header belong to [General]
+        for i, line in enumerate(self.lines):
+            s = line.strip()
+            if s.startswith("[") and s.endswith("]"):
+                if section == "General" and self.general_end is None:
+                    self.general_end = i
+                section = s[1:-1]
+                if section == "General" and self.general_header is None:
+                    self.general_header = i
+                    self.append_at = i + 1
+                    self.general_end = None
                 continue
-
-            rrc_path = os.path.join(SHARE_DIR, rrc_filename)
-
-            if DRY_RUN:
-                print(f"[dry-run] Would write {rrc_path}")
-                print(f"[dry-run] Would add Favorite: Name_{next_idx}={disp_name} (Group: {e.group or '-'})")
+            if section != "General":
+                continue
+            if s:
+                self.append_at = i + 1
+            if s.startswith("RootCount="):
+                self.rootcount_line = i
+                self.rootcount = int(s[10:]) if s[10:].isdigit() else 0
+                continue
+            m = _FAV_KEY.match(s)
+            if m:
+                self.fields.setdefault(int(m.group(2)), {})[m.group(1)] = i
+        if self.general_end is None:
+            self.general_end = len(self.lines)
+        # never hand out an index that is already in use, even if RootCount is stale
+        self.rootcount = max([self.rootcount] + [idx + 1 for idx in self.fields])
+        self.next_idx = self.rootcount
+
+    def allocate(self) -> int:
+        idx = self.next_idx
+        self.next_idx += 1
+        return idx
+
+    def drop_failed(self, rrc_paths: set[str]) -> None:
+        """Forget the new favorites whose .rrc is one of rrc_paths (failed
+        writes), so Favorite.ini never points at a missing file. Their
+        indexes stay unused; favorites already in the file are kept, with
+        their .rrc content unknown."""
+        failed = {i for i in set(self.new) | set(self.rrc_hash) if self.get(i, "File") in rrc_paths}
+        for idx in failed & set(self.new):
+            del self.new[idx]
+        self.by_key = {key: idx for key, idx in self.by_key.items() if idx not in failed or idx in self.fields}
+        for idx in failed & set(self.rrc_hash):
+            del self.rrc_hash[idx]
+
+    def reloaded(self) -> "FavoriteIni":
+        """A FavoriteIni of what dumps() returns, with the .rrc index carried
+        over instead of read again."""
+        fav = FavoriteIni(self.dumps())
+        fav.by_key = {key: idx for key, idx in self.by_key.items() if idx in fav.fields}
+        fav.rrc_hash = {idx: h for idx, h in self.rrc_hash.items() if idx in fav.fields}
+        return fav
+
+    def root_count(self) -> int:
+        return max([self.rootcount] + [idx + 1 for idx in self.new])
+
+    def get(self, idx: int, key: str) -> str | None:
+        if idx in self.new:
+            file, name, group = self.new[idx]
+            return {"File": file, "Name": name}.get(key)
+        line_no = self.fields.get(idx, {}).get(key)
+        if line_no is None or self.lines[line_no] is None:
+            return None
+        return self.lines[line_no].split("=", 1)[1]
+
+    def index_rrc_files(self) -> None:
+        """Read each referenced .rrc once to learn (host, port, user)."""
+        for idx in self.fields:
+            file, name = self.get(idx, "File"), self.get(idx, "Name")
+            if not file or name is None:
+                continue
+            ident = read_rrc_identity(file)
+            if ident is None:
+                continue
+            host, port, user, digest = ident
+            self.by_key.setdefault((name, host, port, user), idx)
+            self.rrc_hash[idx] = digest
+
+    def set(self, idx: int, rrc_path: str, disp_name: str, group: str | None) -> bool:
+        """Store favorite idx; returns True if Favorite.ini changed."""
+        if idx >= self.rootcount:
+            changed = self.new.get(idx) != (rrc_path, disp_name, group)
+            self.new[idx] = (rrc_path, disp_name, group)
+            return changed
+
+        before = (self.get(idx, "File"), self.get(idx, "Name"), self.get(idx, "Descripte"))
+        desc = f'"Group: {group}"' if group else None
+        fields = self.fields[idx]
+        anchor = max(fields.values())
+        for key, value in (("File", rrc_path), ("Name", disp_name)):
+            if key in fields:
+                self.lines[fields[key]] = f"{key}_{idx}={value}"
             else:
-                with open(rrc_path, "w", encoding="utf-8") as out:
-                    out.write(content)
-                fav_text = append_favorite(fav_text, next_idx, rrc_path, disp_name, e.group)
-
-            next_idx += 1
-            created += 1
-
-new_rootcount = next_idx
-if not DRY_RUN:
-    fav_text = set_rootcount(fav_text, new_rootcount)
-    with open(FAV_INI, "w", encoding="utf-8") as f:
-        f.write(fav_text)
-
-print(f"Done. Created: {created}, Skipped: {skipped}. New RootCount: {new_rootcount}.")
-if DRY_RUN:
-    print("Dry-run only: no files written.")
+                self.after.setdefault(anchor, []).append(f"{key}_{idx}={value}")
+        if "Descripte" in fields:
+            self.lines[fields["Descripte"]] = f"Descripte_{idx}={desc}" if desc else None
+        elif desc:
+            self.after.setdefault(anchor, []).append(f"Descripte_{idx}={desc}")
+        return before != (rrc_path, disp_name, desc)
+
+    def dumps(self) -> str:
+        new_count = self.root_count()
+        appended = []
+        for idx, (rrc_path, disp_name, group) in self.new.items():
+            appended.append(f"File_{idx}={rrc_path}")
+            appended.append(f"Name_{idx}={disp_name}")
+            # Put a lightweight description that includes the group (searchable in Rabbit)
+            if group:
+                appended.append(f'Descripte_{idx}="Group: {group}"')
+
+        out = []
+        if self.general_header is None:
+            out.append("[General]")
+            if self.rootcount_line is None:
+                out.append(f"RootCount={new_count}")
+        for i, line in enumerate(self.lines):
+            if appended and i == self.append_at:
+                out.extend(appended)
+                out.append("")
+            if appended and self.append_at <= i < self.general_end:
+                continue  # trailing blank lines of [General] collapse into one
+            if i == self.rootcount_line:
+                line = f"RootCount={new_count}"
+            if line is not None:
+                out.append(line)
+            if i == self.general_header and self.rootcount_line is None:
+                out.append(f"RootCount={new_count}")
+            out.extend(self.after.get(i, ()))
+        if appended and self.append_at >= len(self.lines):
+            out.extend(appended)
+            out.append("")
+        return "\n".join(out) + "\n"
+
+def write_atomic(path: str, text: str, fsync: bool = False) -> None:
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync:
+        fsync_dir(os.path.dirname(path) or ".")
+
+class RabbitBackend:
+    name = "rabbit"
+
+    def __init__(self, fav_ini: str = FAV_INI, share_dir: str = SHARE_DIR, dry_run: bool = False,
+                 writer: ProfileWriter | None = None, verbose: bool = True, favorites: dict | None = None):
+        """favorites: a dict kept from one backend to the next (--watch
+        passes). The Favorite.ini a backend leaves is kept there with its
+        .rrc index, and the next backend starts from it unless the file has
+        changed since, instead of reading every .rrc again."""
+        self.fav_ini = fav_ini
+        self.share_dir = share_dir
+        self.dry_run = dry_run
+        self.verbose = verbose
+        self.created = self.updated = self.unchanged = 0
+        self.skipped = 0
+        self.failed = []
+        self.writer = writer or ProfileWriter()
+
+        self.favorites = favorites
+        self.dirty = False
+        self.rrc_dir = share_dir
+        if not self.writer.local:
+            # archive output: a bundle of just this export, with its own Favorite.ini
+            # naming the .rrc files by base name; --merge-import adds them on the target
+            self.rrc_dir = os.path.join(share_dir, os.path.basename(IMPORT_DIR))
+            self.fav = FavoriteIni("")
+            return
+        signature, fav = (favorites or {}).pop(fav_ini, (None, None))
+        if fav is not None and signature == file_signature(fav_ini):
+            self.fav = fav
+        else:
+            with open(fav_ini, "r", encoding="utf-8", errors="ignore") as f:
+                self.fav = FavoriteIni(f.read())
+            self.fav.index_rrc_files()
+
+        if not dry_run:
+            os.makedirs(share_dir, exist_ok=True)
+
+    @property
+    def next_idx(self) -> int:
+        return self.fav.root_count()
+
+    # render() may run in a worker process (moba_parallel); add_rendered()
+    # allocates the File_N indices, in source order
+    render = staticmethod(render_entry)
+
+    def add(self, e: Entry) -> None:
+        self.add_rendered(e, render_entry(e))
+
+    def add_rendered(self, e: Entry, rendered: tuple[str, str, str] | None) -> None:
+        # Use ONLY the raw bookmark name (no group prefix in visible name)
+        disp_name = e.name
+
+        if rendered is None:
+            self.skipped += 1
+            if self.verbose:
+                print(f"Skipping unsupported protocol entry: {disp_name} ({e.protocol})", file=sys.stderr)
+            return
+        prefix, content, digest = rendered
+
+        key = (disp_name, e.host, e.port, e.user)
+        idx = self.fav.by_key.get(key)
+        if idx is None:
+            idx = self.fav.allocate()
+            rrc_path = f"{prefix}_{idx}_{sanitize_filename(disp_name)}.rrc"
+            if self.writer.local:
+                rrc_path = os.path.join(self.share_dir, rrc_path)
+            self.fav.by_key[key] = idx
+            status = "created"
+        else:
+            # existing favorite (from Favorite.ini or earlier in this export): update in place
+            rrc_path = self.fav.get(idx, "File")
+            status = "updated"
+
+        fav_changed = self.fav.set(idx, rrc_path, disp_name, e.group)
+        self.dirty |= fav_changed
+        if status == "updated" and not fav_changed and self.fav.rrc_hash.get(idx) == digest:
+            self.unchanged += 1
+            return
+        self.fav.rrc_hash[idx] = digest
+        setattr(self, status, getattr(self, status) + 1)
+        rrc_path = os.path.join(self.rrc_dir, rrc_path)
+
+        if self.dry_run:
+            if self.verbose:
+                verb = "add" if status == "created" else "update"
+                print(f"[dry-run] Would write {rrc_path}")
+                print(f"[dry-run] Would {verb} Favorite: Name_{idx}={disp_name} (Group: {e.group or '-'})")
+        else:
+            self.writer.write(rrc_path, content)
+
+    def close(self) -> None:
+        if not self.writer.local:
+            if not self.dry_run:
+                self.writer.write(os.path.join(self.rrc_dir, "Favorite.ini"), self.fav.dumps())
+            self.failed = report_failures(self.writer.close())
+            return
+        self.failed = report_failures(self.writer.close())
+        # a favorite whose .rrc could not be written is left out; the next run adds it again
+        self.fav.drop_failed({r.path for r in self.failed})
+        if self.dry_run:
+            return
+        # Favorite.ini is written once, and only if something changed
+        if self.dirty or self.fav.rootcount_line is None:
+            write_atomic(self.fav_ini, self.fav.dumps(), self.writer.fsync)
+        if self.favorites is not None:
+            self.favorites[self.fav_ini] = (file_signature(self.fav_ini), self.fav.reloaded())
+
+    def result(self) -> ConvertResult:
+        written = [r.path for r in self.writer.completed if r.error is None]
+        return ConvertResult(self.name, self.share_dir, self.created, self.updated, self.unchanged, 0,
+                             self.skipped, written, self.failed)
+
+def merge_import(backend: RabbitBackend, import_dir: str = IMPORT_DIR) -> list[str]:
+    """Add the favorites an archive left in import_dir through backend, as if
+    they had been converted there: a favorite already in backend's
+    Favorite.ini is updated in place, a new one gets the next index. Returns
+    the imported files, to be removed once backend.close() succeeded."""
+    with open(os.path.join(import_dir, "Favorite.ini"), "r", encoding="utf-8", errors="ignore") as f:
+        imported = FavoriteIni(f.read())
+    files = []
+    for idx in sorted(imported.fields):
+        file, name = imported.get(idx, "File"), imported.get(idx, "Name")
+        if not file or name is None:
+            continue
+        path = os.path.join(import_dir, os.path.basename(file))
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        host, port, user, digest = rrc_identity(content)
+        group = re.search(r"^Group=(.*)$", content, re.M)
+        prefix = re.match(r"(.+?)_\d+_", os.path.basename(file))
+        prefix = prefix.group(1) if prefix else "SSH_SSH"
+        e = Entry(name, prefix.partition("_")[0].upper(), host, port, user, "", group and group.group(1))
+        backend.add_rendered(e, (prefix, content, digest))
+        files.append(path)
+    return files + [os.path.join(import_dir, "Favorite.ini")]
+
+def convert(source: Source, rabbit_dir: str | None = None, *, groups=None, select=None, home: str | None = None,
+            cache=None, dry_run: bool = False, write_jobs: int = DEFAULT_JOBS, fsync: bool = False,
+            verbose: bool = False) -> ConvertResult:
+    """Add an export's SSH/Telnet bookmarks to the Rabbit favorites under rabbit_dir
+    (default: home's Documents/Rabbit/RabbitRemoteControl).
+
+    rabbit_dir must already hold etc/Favorite.ini (FileNotFoundError
+    otherwise). Other arguments as for moba2remmina.convert().
+    """
+    rabbit_dir = rabbit_dir or default_rabbit_dir(home)
+    backend = RabbitBackend(f"{rabbit_dir}/etc/Favorite.ini", f"{rabbit_dir}/share", dry_run,
+                            ProfileWriter(write_jobs, fsync), verbose)
+    run_backends(open_entries(source, groups, home, select, cache), [backend])
+    return backend.result()
+
+def merge_main(args) -> None:
+    """--merge-import: the favorites an archive brought, into the local Favorite.ini."""
+    require_rabbit_paths()
+    backend = RabbitBackend(FAV_INI, SHARE_DIR, args.dry_run, ProfileWriter(args.write_jobs, args.fsync))
+    try:
+        imported = merge_import(backend, args.merge_import)
+    except OSError as exc:
+        print(f"Error: cannot import {exc.filename or args.merge_import}: {exc.strerror}", file=sys.stderr)
+        sys.exit(1)
+    backend.close()
+    print(f"Done. Created: {backend.created}, Updated: {backend.updated}, Unchanged: {backend.unchanged}. "
+          f"New RootCount: {backend.next_idx}.")
+    if args.dry_run:
+        print("Dry-run only: no files written.")
+    elif backend.failed:
+        sys.exit(1)
+    else:
+        for path in imported:
+            os.remove(path)
+        try:
+            os.rmdir(args.merge_import)
+        except OSError:
+            pass   # not empty: something else was put there
+        print(f"Removed the imported files from {args.merge_import}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert MobaXterm bookmarks to Rabbit Remote Control favorites (SSH + Telnet), without prefixing names. Stores original group as metadata.")
+    add_common_args(parser)
+    add_filter_args(parser)
+    add_check_args(parser)
+    add_cache_args(parser)
+    add_parallel_args(parser)
+    add_writer_args(parser)
+    add_stats_args(parser)
+    add_watch_args(parser)
+    add_bundle_args(parser)
+    add_pipe_args(parser)
+    parser.add_argument("--merge-import", nargs="?", const=IMPORT_DIR, metavar="DIR",
+                        help="Add the favorites of an extracted --archive to this Favorite.ini instead of "
+                             f"converting an export (default DIR: {IMPORT_DIR})")
+    args = parser.parse_args()
+
+    if args.merge_import:
+        merge_main(args)
+        return
+    pipe = open_pipe(parser, args)
+    bundle = open_bundle(parser, args) or pipe
+    if not bundle and args.ndjson != "entries":
+        require_rabbit_paths()
+    require_file(args.src_file)
+    select = selection_from_args(args)
+    check_parallel_args(parser, args)
+    if args.ndjson == "entries":
+        dump_entries(args, select)
+        return
+
+    favorites = {}   # Favorite.ini and its .rrc index, from one --watch pass to the next
+
+    def make_backends():
+        writer = bundle.writer() if bundle else ProfileWriter(args.write_jobs, args.fsync)
+        return [RabbitBackend(FAV_INI, SHARE_DIR, args.dry_run, writer, favorites=favorites)]
+
+    def report(backends):
+        backend = backends[0]
+        print(f"Done. Created: {backend.created}, Updated: {backend.updated}, Unchanged: {backend.unchanged}, "
+              f"Skipped: {backend.skipped}. New RootCount: {backend.next_idx}.")
+        if args.dry_run:
+            print("Dry-run only: no files written.")
+
+    if args.watch:
+        watch_export(args, make_backends, report)
+        return
+
+    with bundle or nullcontext():
+        backends = make_backends()
+        backend = backends[0]
+        stats = Stats() if args.stats else None
+        with profiling(args.profile):
+            run_export(args, backends, select, stats)
+        if stats:
+            stats.finish()
+
+        report(backends)
+        if bundle:
+            print(bundle.summary())
+    if stats:
+        stats.report(args.stats)
+    if backend.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
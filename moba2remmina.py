@@ -3,187 +3,234 @@ import os
 import re
 import sys
 import argparse
-from pathlib import Path
-from typing import NamedTuple
+from contextlib import nullcontext
+
+from moba_bundle import add_bundle_args, open_bundle
+from moba_cache import add_cache_args
+from moba_check import add_check_args
+from moba_common import (HOME, ConvertResult, Entry, EntryTemplate, Source, add_common_args, open_entries,
+                         require_file, run_backends)
+from moba_filter import add_filter_args, selection_from_args
+from moba_manifest import Manifest, add_sync_args, content_hash, entry_hash, manifest_path
+from moba_parallel import add_parallel_args, check_parallel_args, run_export
+from moba_pipe import add_pipe_args, dump_entries, open_pipe
+from moba_stats import Stats, add_stats_args, profiling
+from moba_watch import add_watch_args, watch_export
+from moba_writer import DEFAULT_JOBS, ProfileWriter, add_writer_args, report_failures
 
 # paths
-HOME = str(Path.home())
-
-class Entry(NamedTuple):
-    name: str
-    protocol: str
-    host: str
-    port: str
-    user: str
-    key_path: str
-
-# Allow overriding the source file via --file / -f (defaults to ./moba_bookmarks.txt)
-parser = argparse.ArgumentParser(description="Convert MobaXterm bookmarks to Remmina profiles.")
-parser.add_argument(
-    "--file", "-f",
-    dest="src_file",
-    default="./moba_bookmarks.txt",
-    help="Path to MobaXterm bookmarks export (default: ./moba_bookmarks.txt)",
-)
-parser.add_argument(
-    "--dry-run", "-n",
-    action="store_true",
-    help="Preview actions without creating any files",
-)
-args = parser.parse_args()
-
-SRC_FILE = args.src_file
-flatpak_dir = f"{HOME}/.var/app/org.remmina.Remmina/data/remmina"
-default_dir = f"{HOME}/.local/share/remmina"
-DEST_DIR = flatpak_dir if os.path.exists(f"{HOME}/.var/app/org.remmina.Remmina") else default_dir
-
-DRY_RUN = args.dry_run
-
-# Validate input file exists for a clearer error message
-if not os.path.isfile(SRC_FILE):
-    print(f"Error: input file not found: {SRC_FILE}", file=sys.stderr)
-    sys.exit(1)
-
-# Only create destination directory when not in dry-run mode
-if not DRY_RUN:
-    os.makedirs(DEST_DIR, exist_ok=True)
-
-current_group = None
-
-# This regex splits the right-hand side of each entry by '%'
-# Example right side:
-# "#109#0%10.57.1.10%22%root%%-1%-1%%%%%0%0%0%%%-1%..."
-# We mainly care about:
-#   index 0 -> "#109#0"   (type code)
-#   index 1 -> host/IP
-#   index 2 -> port
-#   index 3 -> username
-#   index 8 -> maybe key path (ex: "_ProfileDir_\.ssh\id_ed25519")
-#
-# We'll try to be defensive if fields are missing.
-
-def parse_line(name: str, rhs: str) -> Entry:
-    parts = rhs.split('%')
-
-    # protocol guess from parts[0]
-    proto_code = parts[0] if parts else "#109#0"  # default to SSH-ish
-    if proto_code.startswith("#109"):
-        protocol = "SSH"
-        port_default = "22"
-    elif proto_code.startswith("#98"):
-        # Those look like telnet-ish (port 23 in your dump)
-        protocol = "TELNET"
-        port_default = "23"
+def default_dest_dir(home: str | None = None) -> str:
+    """Remmina's profile directory under home: the Flatpak one if installed."""
+    home = home or HOME
+    if os.path.exists(f"{home}/.var/app/org.remmina.Remmina"):
+        return f"{home}/.var/app/org.remmina.Remmina/data/remmina"
+    return f"{home}/.local/share/remmina"
+
+DEST_DIR = default_dest_dir()
+
+# MobaXterm session types Remmina has a plugin for
+REMMINA_PROTOCOLS = ("SSH", "TELNET", "RDP", "VNC", "SFTP")
+
+def build_profile(data: Entry) -> str:
+    """.remmina content for one entry (see profile_template)."""
+    # Build .remmina file content
+    # Remmina wants lowercase keys except "name"
+    remmina_lines = []
+    remmina_lines.append("[remmina]")
+
+    # protocol: one of REMMINA_PROTOCOLS (the backend skips the rest)
+    remmina_lines.append(f"protocol={data.protocol}")
+
+    # visible name
+    disp_name = data.name
+    if data.group:
+        disp_name = f"{data.group}/{disp_name}"
+
+    remmina_lines.append(f"name={disp_name}")
+    remmina_lines.append(f"group={data.group if data.group else ''}")
+
+    # server, username, port
+    if data.protocol in ("SSH", "TELNET"):
+        remmina_lines.append(f"server={data.host}")
     else:
-        protocol = "SSH"
-        port_default = "22"
-
-    host = parts[1] if len(parts) > 1 and parts[1] else ""
-    port = parts[2] if len(parts) > 2 and parts[2] else port_default
-    user = parts[3] if len(parts) > 3 and parts[3] else ""
-
-    # key path detection:
-    key_path = ""
-    # search all parts for something containing ".ssh"
-    for p in parts:
-        if ".ssh" in p or "\\.ssh" in p:
-            key_path = p
-            break
-
-    # normalize key path if found
-    if key_path:
-        key_path = key_path.replace("_ProfileDir_\\", "")
-        key_path = key_path.replace("\\", "/")
-        if not key_path.startswith("/"):
-            key_path = f"{HOME}/{key_path}"
-
-    return Entry(
-        name=name.strip(),
-        protocol=protocol,
-        host=host.strip(),
-        port=port.strip(),
-        user=user.strip(),
-        key_path=key_path.strip(),
-    )
-
-with open(SRC_FILE, "r", encoding="utf-8") as f:
-    for raw_line in f:
-        line = raw_line.rstrip("\n")
-
-        # Skip blank and comment lines
-        if not line or line.lstrip().startswith("#"):
-            continue
-
-        # Detect group blocks like:
-        # [Bookmarks_1]
-        # SubRep=Servers
-        if line.startswith("[Bookmarks_"):
-            current_group = None
-            continue
-
-        if line.startswith("SubRep="):
-            current_group = line.split("=",1)[1].strip()
-            continue
-
-        # skip ImgNum, blank, etc
-        if line.startswith("ImgNum="):
-            continue
-
-        # Match "name=rest"
-        if "=" in line:
-            name, rhs = line.split("=", 1)
-
-            data = parse_line(name, rhs)
-
-            # Build .remmina file content
-            # Remmina wants lowercase keys except "name"
-            remmina_lines = []
-            remmina_lines.append("[remmina]")
-
-            # protocol:
-            # SSH or TELNET
-            if data.protocol == "SSH":
-                remmina_lines.append("protocol=SSH")
-            elif data.protocol == "TELNET":
-                remmina_lines.append("protocol=TELNET")
-            else:
-                remmina_lines.append("protocol=SSH")
-
-            # visible name
-            disp_name = data.name
-            if current_group:
-                disp_name = f"{current_group}/{disp_name}"
-
-            remmina_lines.append(f"name={disp_name}")
-            remmina_lines.append(f"group={current_group if current_group else ''}")
-
-            # server, username, port
-            remmina_lines.append(f"server={data.host}")
-            if data.user:
-                remmina_lines.append(f"username={data.user}")
-            if data.port:
-                remmina_lines.append(f"port={data.port}")
-
-            if data.protocol == "SSH":
-                # auth mode
-                if data.key_path:
-                    remmina_lines.append("ssh_auth=1")
-                    remmina_lines.append(f"ssh_privatekey={data.key_path}")
-                else:
-                    remmina_lines.append("ssh_auth=0")
-
-            # minimal extras so Remmina is happy
-            remmina_lines.append("disablepasswordstorage=0")
-            remmina_lines.append("notes=")
-
-            # write file
-            # sanitize filename
-            safe_filename = re.sub(r'[^A-Za-z0-9._-]+', "_", data.name)
-            outfile = os.path.join(DEST_DIR, safe_filename + ".remmina")
-
-            if DRY_RUN:
+        # the RDP, VNC and SFTP plugins read the port from server=host:port
+        remmina_lines.append(f"server={data.host}:{data.port}" if data.port else f"server={data.host}")
+    if data.user:
+        remmina_lines.append(f"username={data.user}")
+    if data.port and data.protocol in ("SSH", "TELNET"):
+        remmina_lines.append(f"port={data.port}")
+
+    if data.protocol in ("SSH", "SFTP"):
+        # auth mode
+        if data.key_path:
+            remmina_lines.append("ssh_auth=1")
+            remmina_lines.append(f"ssh_privatekey={data.key_path}")
+        else:
+            remmina_lines.append("ssh_auth=0")
+
+    # minimal extras so Remmina is happy
+    remmina_lines.append("disablepasswordstorage=0")
+    remmina_lines.append("notes=")
+
+    return "\n".join(remmina_lines) + "\n"
+
+profile_template = EntryTemplate(build_profile)
+
+def render_profile(data: Entry) -> tuple[str, str]:
+    """Return (safe filename, .remmina content) for one entry."""
+    return profile_filename(data.name), profile_template(data)
+
+def render_entry(data: Entry) -> tuple[str, str, str] | None:
+    """The part of RemminaBackend.add() that only depends on the entry: its
+    profile and the manifest hashes, or None for a protocol Remmina lacks."""
+    if data.protocol not in REMMINA_PROTOCOLS:
+        return None
+    content = profile_template(data)
+    return content, entry_hash(data), content_hash(content)
+
+def profile_filename(name: str) -> str:
+    # sanitize filename
+    return re.sub(r'[^A-Za-z0-9._-]+', "_", name) + ".remmina"
+
+class RemminaBackend:
+    name = "remmina"
+
+    def __init__(self, dest_dir: str = DEST_DIR, dry_run: bool = False,
+                 force: bool = False, prune: bool = False, writer: ProfileWriter | None = None,
+                 verbose: bool = True):
+        self.dest_dir = dest_dir
+        self.dry_run = dry_run
+        self.prune = prune
+        self.verbose = verbose
+        self.skipped = 0
+        self.failed = []
+        self.writer = writer or ProfileWriter()
+        # archive output: a self-contained bundle, the local directory is left alone
+        local = self.writer.local
+        self.manifest = Manifest(manifest_path(self.name, dest_dir) if local else None, dest_dir, force)
+        self.names = self.manifest.name_index()
+        # Only create destination directory when not in dry-run mode
+        if local and not dry_run:
+            os.makedirs(dest_dir, exist_ok=True)
+
+    @property
+    def created(self) -> int:
+        return self.manifest.created
+
+    # render() may run in a worker process (moba_parallel); add_rendered()
+    # claims names and records the manifest, in source order
+    render = staticmethod(render_entry)
+
+    def add(self, data: Entry) -> None:
+        self.add_rendered(data, render_entry(data))
+
+    def add_rendered(self, data: Entry, rendered: tuple[str, str, str] | None) -> None:
+        if rendered is None:
+            self.skipped += 1
+            return
+        content, *hashes = rendered
+        filename = self.names.claim(data.name, data.group, profile_filename)
+        outfile = os.path.join(self.dest_dir, filename)
+        if self.manifest.check(filename, data, content, self.names.exists(filename), hashes) == "unchanged":
+            return
+
+        if self.dry_run:
+            if self.verbose:
                 print(f"[dry-run] Would write {outfile}")
+        else:
+            self.writer.write(outfile, content)
+
+    def close(self) -> None:
+        if self.verbose:
+            self.names.report()
+        results = self.writer.close()
+        self.failed = report_failures(results)
+        for r in results:
+            if r.error is None:
+                if self.verbose:
+                    print(f"Wrote {r.path}")
             else:
-                with open(outfile, "w", encoding="utf-8") as out:
-                    out.write("\n".join(remmina_lines) + "\n")
-                print(f"Wrote {outfile}")
+                self.manifest.forget(os.path.basename(r.path))
+        if self.prune:
+            self.manifest.prune(self.dry_run, self.verbose)
+        if not self.dry_run:
+            self.manifest.save()
+
+    def result(self) -> ConvertResult:
+        m = self.manifest
+        written = [r.path for r in self.writer.completed if r.error is None]
+        return ConvertResult(self.name, self.dest_dir, m.created, m.updated, m.unchanged, m.removed,
+                             self.skipped, written, self.failed)
+
+def convert(source: Source, dest_dir: str | None = None, *, groups=None, select=None, home: str | None = None,
+            cache=None, dry_run: bool = False, force: bool = False, prune: bool = False,
+            write_jobs: int = DEFAULT_JOBS, fsync: bool = False, verbose: bool = False) -> ConvertResult:
+    """Convert an export to Remmina profiles in dest_dir (default: home's Remmina directory).
+
+    source is a file name, the raw bytes of an export, or an iterable of its
+    lines; home (default: the current user's) is used for the default
+    directory and for _ProfileDir_ key paths. select, a moba_filter.Selection,
+    restricts the bookmarks converted. cache, a moba_cache.ParseCache, reuses
+    the parse of an earlier call or run. Nothing is printed unless verbose;
+    failed writes are returned in the result, not raised.
+    """
+    backend = RemminaBackend(dest_dir or default_dest_dir(home), dry_run, force, prune,
+                             ProfileWriter(write_jobs, fsync), verbose)
+    run_backends(open_entries(source, groups, home, select, cache), [backend])
+    return backend.result()
+
+def main():
+    # Allow overriding the source file via --file / -f (defaults to ./moba_bookmarks.txt)
+    parser = argparse.ArgumentParser(description="Convert MobaXterm bookmarks to Remmina profiles.")
+    add_common_args(parser)
+    add_filter_args(parser)
+    add_check_args(parser)
+    add_cache_args(parser)
+    add_parallel_args(parser)
+    add_sync_args(parser)
+    add_writer_args(parser)
+    add_stats_args(parser)
+    add_watch_args(parser)
+    add_bundle_args(parser)
+    add_pipe_args(parser)
+    args = parser.parse_args()
+
+    require_file(args.src_file)
+    select = selection_from_args(args)
+    check_parallel_args(parser, args)
+    pipe = open_pipe(parser, args)
+    if args.ndjson == "entries":
+        dump_entries(args, select)
+        return
+    bundle = open_bundle(parser, args) or pipe
+
+    def make_backends():
+        writer = bundle.writer() if bundle else ProfileWriter(args.write_jobs, args.fsync)
+        return [RemminaBackend(DEST_DIR, args.dry_run, args.force, args.prune, writer)]
+
+    def report(backends):
+        backend = backends[0]
+        print(f"{backend.manifest.summary()}, Skipped: {backend.skipped}")
+
+    if args.watch:
+        watch_export(args, make_backends, report)
+        return
+
+    with bundle or nullcontext():
+        backends = make_backends()
+        backend = backends[0]
+        stats = Stats() if args.stats else None
+        with profiling(args.profile):
+            run_export(args, backends, select, stats)
+        if stats:
+            stats.finish()
+        report(backends)
+        if bundle:
+            print(bundle.summary())
+    if stats:
+        stats.report(args.stats)
+    if backend.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
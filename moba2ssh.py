@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""Convert MobaXterm SSH bookmarks to OpenSSH client config (~/.ssh/config).
+
+Every SubRep group becomes one file, ~/.ssh/mobaxterm/<group>.conf, and
+~/.ssh/config gets a single ``Include mobaxterm/*.conf`` line at the top
+(with the absolute path of the files when --ssh-dir is not ~/.ssh, since ssh
+resolves a relative Include against ~/.ssh).
+All the files share one ssh namespace, so a host alias is unique across
+groups: a name already used by an earlier group gets the group appended.
+Inside a file, each bookmark whose name is not its host name gets a two-line
+``Host <name>`` / ``HostName`` block, and all bookmarks sharing a user, port
+and key path are merged into one ``Host a b c ...`` stanza. ssh uses the
+first value it finds for each keyword, so the split blocks apply together.
+The output only depends on the export: a re-run writes identical files and
+leaves unchanged ones alone.
+"""
+import os, re, sys, argparse
+from contextlib import nullcontext
+
+from moba_bundle import add_bundle_args, open_bundle
+from moba_cache import add_cache_args
+from moba_check import add_check_args
+from moba_common import (HOME, ConvertResult, Entry, Source, add_common_args, open_entries,
+                         require_file, run_backends)
+from moba_filter import add_filter_args, selection_from_args
+from moba_manifest import add_sync_args
+from moba_names import NameIndex
+from moba_parallel import add_parallel_args, check_parallel_args, run_export
+from moba_pipe import add_pipe_args, dump_entries, open_pipe
+from moba_stats import Stats, add_stats_args, profiling
+from moba_store import EntryStore
+from moba_watch import add_watch_args, watch_export
+from moba_writer import DEFAULT_JOBS, ProfileWriter, add_writer_args, report_failures
+from moba2rabbit import write_atomic
+
+def default_ssh_dir(home: str | None = None) -> str:
+    return f"{home or HOME}/.ssh"
+
+SSH_DIR = default_ssh_dir()
+INCLUDE_DIR = "mobaxterm"                     # relative to the ssh directory
+INCLUDE_LINE = f"Include {INCLUDE_DIR}/*.conf"
+
+# session types that connect over ssh and so honour ~/.ssh/config
+SSH_PROTOCOLS = ("SSH", "SFTP", "MOSH")
+HOSTS_PER_LINE = 32   # aliases per "Host" line of a merged stanza
+
+def host_alias(name: str) -> str:
+    # ssh splits Host patterns on whitespace and treats * ? ! , as pattern syntax;
+    # "\" and "/" only come from the group in a fallback name
+    return re.sub(r'[\s*?!,"#=\\/]+', "-", name.strip()).strip("-") or "host"
+
+def group_filename(group: str) -> str:
+    return (re.sub(r'[^A-Za-z0-9._-]+', "_", group).strip("_") or "ungrouped") + ".conf"
+
+def quote(value: str) -> str:
+    # ssh_config has no escape for '"' inside quotes; add() skips such values
+    return f'"{value}"' if re.search(r'[\s#]', value) else value
+
+def config_aliases(text: str) -> set[str]:
+    """Every name on the Host lines of a config file this converter wrote."""
+    return {alias for line in text.splitlines() if line.startswith("Host ") for alias in line.split()[1:]}
+
+def config_path(key_path: str, home: str) -> str:
+    # ~ keeps the generated files valid for the same layout in any home
+    return "~" + key_path[len(home):] if key_path.startswith(f"{home}/") else key_path
+
+def build_group_config(group: str | None, hosts: list[tuple[str, Entry]], home: str = HOME) -> str:
+    """One group's config file; hosts is [(alias, entry)] in export order."""
+    lines = [f"# MobaXterm group: {group or '(none)'}",
+             "# Generated by moba2ssh.py; changes are overwritten on the next run.", ""]
+    stanzas: dict[tuple[str, str, str], list[str]] = {}
+    for alias, e in hosts:
+        if e.host and e.host != alias:
+            lines.append(f"Host {alias}")
+            lines.append(f"    HostName {e.host}")
+        stanzas.setdefault((e.user, e.port, e.key_path), []).append(alias)
+    if len(lines) > 3:
+        lines.append("")
+
+    for (user, port, key_path), aliases in stanzas.items():
+        settings = []
+        if user:
+            settings.append(f"    User {quote(user)}")
+        if port and port != "22":
+            settings.append(f"    Port {port}")
+        if key_path:
+            settings.append(f"    IdentityFile {quote(config_path(key_path, home))}")
+            settings.append("    IdentitiesOnly yes")
+        if not settings:
+            continue   # nothing beyond HostName to say about these
+        for i in range(0, len(aliases), HOSTS_PER_LINE):
+            lines.append("Host " + " ".join(aliases[i:i + HOSTS_PER_LINE]))
+            lines.extend(settings)
+            lines.append("")
+    return "\n".join(lines).rstrip("\n") + "\n"
+
+def include_line(ssh_dir: str, home: str | None = None) -> str:
+    """The Include line for the files under ssh_dir."""
+    if os.path.abspath(ssh_dir) == default_ssh_dir(home):
+        return INCLUDE_LINE
+    return f"Include {quote(os.path.join(os.path.abspath(ssh_dir), INCLUDE_DIR, '*.conf'))}"
+
+def add_include(config_text: str, include: str = INCLUDE_LINE) -> str | None:
+    """config_text with the Include line at the top, or None if it is already there."""
+    for line in config_text.splitlines():
+        if line.strip().lower() == include.lower():
+            return None
+    # Include must come before the first Host/Match block to apply to every host
+    return f"{include}\n\n{config_text}" if config_text.strip() else f"{include}\n"
+
+class SshBackend:
+    name = "ssh"
+
+    def __init__(self, ssh_dir: str = SSH_DIR, dry_run: bool = False, force: bool = False,
+                 prune: bool = False, writer: ProfileWriter | None = None, verbose: bool = True,
+                 home: str | None = None, include: bool = True):
+        self.ssh_dir = ssh_dir
+        self.conf_dir = os.path.join(ssh_dir, INCLUDE_DIR)
+        self.dry_run = dry_run
+        self.force = force
+        self.prune = prune
+        self.verbose = verbose
+        self.include = include
+        self.home = home or HOME
+        self.include_line = include_line(ssh_dir, self.home)
+        self.writer = writer or ProfileWriter()
+        self.store = EntryStore()
+        self.created = self.updated = self.unchanged = self.removed = self.skipped = 0
+        self.failed = []
+        # SubRep groups re-read by a partial --watch pass; None: the whole export
+        self.scope_groups: set[str] | None = None
+
+    def add(self, e: Entry) -> None:
+        if e.protocol not in SSH_PROTOCOLS or not e.host:
+            self.skipped += 1
+            return
+        if '"' in e.host + e.user + e.key_path:
+            self.skipped += 1
+            if self.verbose:
+                print(f"Skipping {e.group or ''}/{e.name}: ssh_config cannot quote '\"' in a host, user or key path",
+                      file=sys.stderr)
+            return
+        if e.port and not (e.port.isdigit() and 0 < int(e.port) < 65536):
+            # one bad Port line makes ssh reject every file the Include pulls in
+            self.skipped += 1
+            if self.verbose:
+                print(f"Skipping {e.group or ''}/{e.name}: port {e.port!r} is not a port number", file=sys.stderr)
+            return
+        self.store.append(e)
+
+    def render(self, taken: set[str] = frozenset()) -> dict[str, str]:
+        """{file name: content} for every group, in export order. taken:
+        aliases of groups that this pass does not render."""
+        aliases = NameIndex(None)
+        aliases.claimed.update(taken)
+        by_group: dict[str | None, list[tuple[str, Entry]]] = {}
+        for e in self.store:
+            by_group.setdefault(e.group, []).append((aliases.claim(e.name, e.group, host_alias), e))
+        if self.verbose:
+            aliases.report()
+        files = NameIndex(None)
+        return {files.claim(g or "", None, group_filename): build_group_config(g, hosts, self.home)
+                for g, hosts in by_group.items()}
+
+    def _taken(self, existing: set[str]) -> set[str]:
+        """Aliases in the files of the groups a partial --watch pass did not re-read."""
+        mine = {group_filename(g or "") for g in self.scope_groups | set(self.store.column("group"))}
+        taken = set()
+        for filename in existing - mine:
+            taken |= config_aliases(self._read(os.path.join(self.conf_dir, filename)) or "")
+        return taken
+
+    def close(self) -> None:
+        local = self.writer.local
+        existing = set()
+        if local:
+            try:
+                existing = {n for n in os.listdir(self.conf_dir) if n.endswith(".conf")}
+            except FileNotFoundError:
+                pass
+            if not self.dry_run:
+                os.makedirs(self.conf_dir, mode=0o700, exist_ok=True)
+        rendered = self.render(self._taken(existing) if self.scope_groups is not None else frozenset())
+
+        for filename, content in rendered.items():
+            path = os.path.join(self.conf_dir, filename)
+            if filename in existing:
+                if not self.force and self._read(path) == content:
+                    self.unchanged += 1
+                    continue
+                self.updated += 1
+            else:
+                self.created += 1
+            if self.dry_run:
+                if self.verbose:
+                    print(f"[dry-run] Would write {path}")
+            else:
+                self.writer.write(path, content)
+
+        results = self.writer.close()
+        self.failed = report_failures(results)
+        if local and not self.dry_run:
+            for r in results:
+                if r.error is None:
+                    # ssh refuses config files that others can write
+                    os.chmod(r.path, 0o600)
+
+        if self.prune and local:
+            self._prune(existing - set(rendered))
+        if self.include and local:
+            self._include()
+        elif self.include and self.verbose:
+            # archive or NDJSON output: ~/.ssh/config is not ours to ship
+            print(f"To use these files, add '{self.include_line}' at the top of ~/.ssh/config.")
+
+    def _read(self, path: str) -> str | None:
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _prune(self, stale: set[str]) -> None:
+        if self.scope_groups is not None:
+            # a partial pass only knows the groups it re-read
+            stale &= {group_filename(g) for g in self.scope_groups}
+        for filename in sorted(stale):
+            path = os.path.join(self.conf_dir, filename)
+            if self.dry_run:
+                if self.verbose:
+                    print(f"[dry-run] Would remove {path}")
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                if self.verbose:
+                    print(f"Removed {path}")
+            self.removed += 1
+
+    def _include(self) -> None:
+        config = os.path.join(self.ssh_dir, "config")
+        text = self._read(config)
+        new = add_include(text or "", self.include_line)
+        # keep the mode of an existing config; ssh rejects one others can write
+        mode = os.stat(config).st_mode & 0o777 if text is not None else 0o600
+        if new is None:
+            return
+        if self.dry_run:
+            if self.verbose:
+                print(f"[dry-run] Would add '{self.include_line}' to {config}")
+            return
+        os.makedirs(self.ssh_dir, mode=0o700, exist_ok=True)
+        write_atomic(config, new, self.writer.fsync)
+        os.chmod(config, mode)
+        if self.verbose:
+            print(f"Added '{self.include_line}' to {config}")
+
+    def result(self) -> ConvertResult:
+        written = [r.path for r in self.writer.completed if r.error is None]
+        return ConvertResult(self.name, self.conf_dir, self.created, self.updated, self.unchanged, self.removed,
+                             self.skipped, written, self.failed)
+
+def convert(source: Source, ssh_dir: str | None = None, *, groups=None, select=None, home: str | None = None,
+            cache=None, dry_run: bool = False, force: bool = False, prune: bool = False, include: bool = True,
+            write_jobs: int = DEFAULT_JOBS, fsync: bool = False, verbose: bool = False) -> ConvertResult:
+    """Convert an export to OpenSSH config files under ssh_dir (default: home's ~/.ssh).
+
+    Arguments as for moba2remmina.convert().
+    """
+    backend = SshBackend(ssh_dir or default_ssh_dir(home), dry_run, force, prune,
+                         ProfileWriter(write_jobs, fsync), verbose, home, include)
+    run_backends(open_entries(source, groups, home, select, cache), [backend])
+    return backend.result()
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert MobaXterm SSH bookmarks to OpenSSH client config files.")
+    add_common_args(ap)
+    add_filter_args(ap)
+    add_check_args(ap)
+    add_cache_args(ap)
+    add_parallel_args(ap)
+    add_sync_args(ap)
+    add_writer_args(ap)
+    add_stats_args(ap)
+    ap.add_argument("--ssh-dir", default=SSH_DIR, help=f"OpenSSH directory (default: {SSH_DIR})")
+    ap.add_argument("--no-include", dest="include", action="store_false",
+                    help=f"Do not add '{INCLUDE_LINE}' (an absolute path outside {SSH_DIR}) to <ssh-dir>/config")
+    add_watch_args(ap)
+    add_bundle_args(ap)
+    add_pipe_args(ap)
+    args = ap.parse_args()
+
+    require_file(args.src_file)
+    select = selection_from_args(args)
+    check_parallel_args(ap, args)
+    pipe = open_pipe(ap, args)
+    if args.ndjson == "entries":
+        dump_entries(args, select)
+        return
+    bundle = open_bundle(ap, args) or pipe
+
+    def make_backends():
+        writer = bundle.writer() if bundle else ProfileWriter(args.write_jobs, args.fsync)
+        return [SshBackend(os.path.expanduser(args.ssh_dir), args.dry_run, args.force, args.prune, writer,
+                           include=args.include)]
+
+    def report(backends):
+        b = backends[0]
+        print(f"Created: {b.created}, Updated: {b.updated}, Unchanged: {b.unchanged}, Removed: {b.removed}, "
+              f"Skipped: {b.skipped}")
+        print(f"Config directory: {b.conf_dir}")
+        if args.dry_run:
+            print("Dry-run only: no files written.")
+
+    if args.watch:
+        watch_export(args, make_backends, report)
+        return
+
+    with bundle or nullcontext():
+        backends = make_backends()
+        backend = backends[0]
+        stats = Stats() if args.stats else None
+        with profiling(args.profile):
+            run_export(args, backends, select, stats)
+        if stats:
+            stats.finish()
+
+        report(backends)
+        if bundle:
+            print(bundle.summary())
+    if stats:
+        stats.report(args.stats)
+    if backend.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
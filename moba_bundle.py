@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""--archive: write the rendered profiles into one tar or zip file.
+
+Bundle is the archive; every backend gets its own bundle.writer(), which
+has the ProfileWriter interface (write(), close(), completed) but appends
+members to the archive instead of creating files. Member names are the
+paths the backends would have written, relative to $HOME, so extracting the
+archive in a home directory gives the layout the converters produce.
+
+Backends given a bundle writer (``local`` is False) build a self-contained
+bundle: no manifest is read or saved, and no local directory is created or
+changed. Rabbit starts from an empty Favorite.ini and puts it, with the .rrc
+files, into an import directory that moba2rabbit.py --merge-import adds to
+the target's own Favorite.ini.
+
+The converters use a Bundle as a context manager: the archive is finished on
+exit, and while it streams to stdout ("-") everything they print goes to
+stderr instead.
+"""
+import os
+import struct
+import sys
+import time
+
+from moba_common import HOME
+from moba_writer import WriteResult
+
+BLOCK = 512
+RECORD = 20 * BLOCK       # tar pads the archive to whole records
+FLUSH_AT = 1 << 20        # members are collected and written in 1 MiB chunks
+
+_USTAR = struct.Struct("100s8s8s8s12s12s8sc100s8s32s32s8s8s155s12s")
+# tar file name suffix -> module whose open() compresses the stream
+_COMPRESSORS = {".tar": None, ".gz": "gzip", ".tgz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+def tar_header(name: str, size: int, mtime: int) -> bytes:
+    """Header block(s) of a regular 0644 file owned by root.
+
+    ASCII names that fit ustar get a header packed directly (byte for byte
+    what tarfile writes for names up to 100 bytes, several times faster);
+    the others get tarfile's PAX header.
+    """
+    raw = name.encode("utf-8")
+    prefix = b""
+    if len(raw) > 100:
+        prefix, _, raw = raw.rpartition(b"/")
+    if not raw or len(raw) > 100 or len(prefix) > 155 or not name.isascii():
+        import tarfile
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = size, mtime, 0o644
+        return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+    header = _USTAR.pack(raw, b"0000644\0", b"0000000\0", b"0000000\0", b"%011o\0" % size, b"%011o\0" % mtime,
+                         b" " * 8, b"0", b"", b"ustar\x0000", b"", b"", b"", b"", prefix, b"")
+    return header[:148] + b"%06o\0" % sum(header) + header[155:]
+
+class Bundle:
+    def __init__(self, dest: str, home: str | None = None, fileobj=None):
+        """dest: a .tar/.tar.gz/.tgz/.tar.bz2/.tar.xz or .zip file name, or
+        "-" for an uncompressed tar stream on stdout. With fileobj (a binary
+        file object, e.g. io.BytesIO), dest only names the format and the
+        archive goes to fileobj, which is left open."""
+        self.dest = dest
+        self.home = (home or HOME).rstrip("/")
+        self.mtime = int(time.time())
+        self.count = 0
+        self.nbytes = 0
+        self.zip = None
+        self.out = None           # the tar stream
+        self.buf = bytearray()
+        self.size = 0             # tar bytes produced so far
+        self.stream = None
+        self._stdout = None
+        if dest == "-":
+            self.stream = self.out = sys.stdout.buffer
+        elif dest.endswith(".zip"):
+            import zipfile   # slow to import; only --archive needs it
+            self.zip = zipfile.ZipFile(dest if fileobj is None else fileobj, "w", zipfile.ZIP_DEFLATED)
+        else:
+            ext = os.path.splitext(dest)[1]
+            if ext not in _COMPRESSORS:
+                raise ValueError(f"unknown archive type: {dest} (use .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .zip)")
+            module = _COMPRESSORS[ext]
+            if module is None and fileobj is not None:
+                self.stream = self.out = fileobj
+            elif module is None:
+                self.out = open(dest, "wb")
+            else:
+                # the compressors leave a file object they were given open
+                self.out = __import__(module).open(dest if fileobj is None else fileobj, "wb")
+
+    def arcname(self, path) -> str:
+        path = os.path.abspath(str(path))
+        if path.startswith(self.home + "/"):
+            return path[len(self.home) + 1:]
+        return path.lstrip("/")
+
+    def _flush(self) -> None:
+        self.out.write(self.buf)
+        self.size += len(self.buf)
+        self.buf = bytearray()
+
+    def add(self, path, content: str) -> WriteResult:
+        t0 = time.perf_counter()
+        name, data = self.arcname(path), content.encode("utf-8")
+        if self.zip is None:
+            buf = self.buf
+            buf += tar_header(name, len(data), self.mtime)
+            buf += data
+            buf += bytes(-len(data) % BLOCK)
+            if len(buf) >= FLUSH_AT:
+                self._flush()
+        else:
+            import zipfile
+            info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            self.zip.writestr(info, data)
+        self.count += 1
+        self.nbytes += len(data)
+        return WriteResult(name, len(data), time.perf_counter() - t0, None)
+
+    def writer(self) -> "BundleWriter":
+        return BundleWriter(self)
+
+    def close(self) -> None:
+        if self.zip is not None:
+            self.zip.close()
+            return
+        # end of archive: two zero blocks, then padding to a whole record
+        self.buf += bytes(2 * BLOCK)
+        self.buf += bytes(-(self.size + len(self.buf)) % RECORD)
+        self._flush()
+        if self.stream is None:
+            self.out.close()
+        else:
+            self.stream.flush()
+
+    def summary(self) -> str:
+        where = "stdout" if self.dest == "-" else self.dest
+        return f"Archive: {where} ({self.count} files, {self.nbytes} bytes)"
+
+    def __enter__(self) -> "Bundle":
+        if self.dest == "-":
+            # the archive owns stdout; progress and summaries go to stderr
+            self._stdout, sys.stdout = sys.stdout, sys.stderr
+        return self
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.close()
+        finally:
+            if self._stdout is not None:
+                sys.stdout, self._stdout = self._stdout, None
+
+class BundleWriter:
+    """ProfileWriter stand-in for one backend; see Bundle."""
+    local = False
+    fsync = False
+
+    def __init__(self, bundle: Bundle):
+        self.bundle = bundle
+        self.results: list[WriteResult] = []
+        self.completed: list[WriteResult] = []
+
+    def write(self, path, content: str) -> None:
+        self.results.append(self.bundle.add(path, content))
+
+    def close(self) -> list[WriteResult]:
+        results, self.results = self.results, []
+        self.completed = results
+        return results
+
+def open_bundle(parser, args) -> Bundle | None:
+    """The Bundle for --archive, or None without it."""
+    if not args.archive:
+        return None
+    if args.dry_run or getattr(args, "watch", False):
+        parser.error("--archive cannot be combined with --dry-run or --watch")
+    if args.archive == "-" and sys.stdout.isatty():
+        parser.error("refusing to write an archive to a terminal; redirect stdout or use --archive FILE")
+    try:
+        return Bundle(args.archive)
+    except ValueError as exc:
+        parser.error(str(exc))
+    except OSError as exc:
+        print(f"Error: cannot create {args.archive}: {exc.strerror}", file=sys.stderr)
+        sys.exit(1)
+
+def add_bundle_args(parser) -> None:
+    parser.add_argument("--archive", metavar="FILE",
+                        help="Write the profiles into FILE (.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .zip; "
+                             "'-' for a tar on stdout) instead of the profile directories")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Cache of parsed exports, so converting the same export again skips the parse.
+
+With --cache, the first run over an export parses all of its bookmarks into
+an EntryStore and saves it (EntryStore.to_bytes(): interned columns, no
+per-entry objects) under ``$XDG_CACHE_HOME/mobaxterm-sessions/parsed/``.
+Later runs, by any converter, for any home, group or filter set, load it
+back instead. It is off by default: a miss parses every section, even with
+-g or a selection that would otherwise decode only a few, so it only pays
+off for exports converted again and again (moba2fleet, moba_daemon).
+
+- The key is a hash of the raw bytes of the export's [Bookmarks*] sections,
+  its encoding, and the parser: the source of moba_common, moba_ini and
+  moba_store and the Python version. Editing a bookmark or upgrading the
+  converters simply misses; the rest of a MobaXterm.ini can change freely.
+- Key paths are cached relative to a placeholder home and resolved against
+  the run's home on load, so one file serves every user (moba2fleet).
+- -g and the selection options are applied to the loaded store: group tests
+  once per distinct group, the rest per entry.
+- The directory is kept under --cache-size. Every hit touches its file, and
+  the least recently used files go first.
+
+A long-running process (moba_daemon) also keeps the most recently used
+stores in memory; the cache is then safe to share between threads.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+from moba_common import HOME, Entry, iter_entries
+from moba_ini import detect_encoding
+from moba_store import EntryStore
+
+CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME", f"{HOME}/.cache"), "mobaxterm-sessions", "parsed")
+DEFAULT_SIZE_MB = 256
+MAGIC = b"mobaxterm-sessions entries\n"
+# stands in for the home directory in cached key paths
+HOME_MARK = "\0home"
+
+_parser_version = None
+
+def parser_version() -> str:
+    """Hash of the parsing code and the Python version."""
+    global _parser_version
+    if _parser_version is None:
+        import moba_common, moba_ini, moba_store
+        h = hashlib.sha1(sys.version.encode("utf-8"))
+        for module in (moba_common, moba_ini, moba_store):
+            with open(module.__file__, "rb") as f:
+                h.update(f.read())
+        _parser_version = h.hexdigest()
+    return _parser_version
+
+class ParseCache:
+    def __init__(self, directory: str | None = CACHE_DIR, max_bytes: int = DEFAULT_SIZE_MB << 20,
+                 memory: int = 0):
+        """directory None: no files, only memory. memory: how many parsed
+        exports to keep in memory (0: none)."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = memory
+        self.recent: OrderedDict[str, EntryStore] = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading: dict[str, list] = {}   # key -> [lock, EntryStore once loaded]
+        self.hits = self.memory_hits = self.misses = 0
+
+    def key(self, index) -> str:
+        """Cache key of an opened ExportIndex: its bookmark sections only."""
+        h = hashlib.sha256(parser_version().encode("ascii"))
+        h.update(detect_encoding(index.data[:4])[0].encode("ascii"))
+        with memoryview(index.data) as data:   # straight from the mapping
+            for s in index.sections:
+                h.update(b"%d\n" % (s.end - s.start))
+                h.update(data[s.start:s.end])
+        return h.hexdigest()[:40]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.entries")
+
+    def load(self, key: str) -> EntryStore | None:
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(MAGIC):
+            return None
+        try:
+            store = EntryStore.from_bytes(memoryview(data)[len(MAGIC):])
+        except ValueError:
+            return None   # truncated or from another version; the next save replaces it
+        try:
+            os.utime(path)   # the mtime is the last use, for eviction
+        except OSError:
+            pass
+        return store
+
+    def save(self, key: str, store: EntryStore) -> None:
+        if self.directory is None:
+            return
+        data = MAGIC + store.to_bytes()
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        # concurrent runs (moba2fleet workers, daemon threads) may save the same key
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used files until the directory fits max_bytes."""
+        files = []
+        with os.scandir(self.directory) as it:
+            for d in it:
+                if d.name.endswith(".entries"):
+                    try:
+                        st = d.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((st.st_mtime, d.name, st.st_size))
+        total = sum(size for _, _, size in files)
+        for _, name, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def store(self, index) -> EntryStore:
+        """All bookmarks of an opened ExportIndex, from the cache or parsed now.
+        Key paths under the home start with HOME_MARK."""
+        key = self.key(index)
+        with self.lock:
+            store = self._recent(key)
+            if store is not None:
+                return store
+            # threads asking for the same export wait for one load or parse
+            # and take its result, whether or not it was kept or saved
+            slot = self.loading.setdefault(key, [threading.Lock(), None])
+        with slot[0]:
+            if slot[1] is None:
+                slot[1] = self._load_or_parse(key, index)
+            store = slot[1]
+        with self.lock:
+            if self.loading.get(key) is slot:
+                del self.loading[key]
+        return store
+
+    def _recent(self, key: str) -> EntryStore | None:
+        store = self.recent.get(key)
+        if store is not None:
+            self.recent.move_to_end(key)
+            self.memory_hits += 1
+        return store
+
+    def _load_or_parse(self, key: str, index) -> EntryStore:
+        store = self.load(key)
+        with self.lock:
+            if store is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if store is None:
+            store = EntryStore(iter_entries(index.iter_lines(), HOME_MARK))
+            try:
+                self.save(key, store)
+            except OSError as exc:
+                # a read-only or full cache directory only costs the speed-up
+                print(f"Warning: could not save the parse cache: {exc.strerror or exc}", file=sys.stderr)
+        if self.memory:
+            with self.lock:
+                self.recent[key] = store
+                while len(self.recent) > self.memory:
+                    self.recent.popitem(last=False)
+        return store
+
+    def entries(self, index, groups: Iterable[str] | None = None, home: str | None = None,
+                select=None) -> Iterator[Entry]:
+        """What read_entries() yields for index, via the cache."""
+        home, mark = home or HOME, f"{HOME_MARK}/"
+        store = self.store(index).mapped("key_path",
+                                         lambda p: home + p[len(HOME_MARK):] if p.startswith(mark) else p)
+        rows = None
+        if groups is not None:
+            wanted = set(groups)
+            rows = store.where(group=lambda g: (g or "") in wanted)
+        if select is None:
+            return store.rows(rows)
+        rows = store.where(rows, group=select.group_ok)
+        return filter(select.entry_ok, store.rows(rows))
+
+def add_cache_args(parser) -> None:
+    parser.add_argument("--cache", action="store_true",
+                        help="Load the parsed export from the parse cache, or parse all of it and save it there "
+                             "(pays off when the same export is converted repeatedly)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_SIZE_MB, metavar="MB",
+                        help=f"Size limit of the parse cache in {CACHE_DIR} (default: {DEFAULT_SIZE_MB})")
+
+def cache_from_args(args) -> ParseCache | None:
+    if not getattr(args, "cache", False):
+        return None
+    return ParseCache(max_bytes=args.cache_size << 20)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""--check: resolve and TCP-probe every bookmark's host before converting.
+
+The entries are buffered (in an EntryStore), and each distinct (host, port)
+pair is probed once on an asyncio loop, at most --check-concurrency at a
+time, each step bounded by --check-timeout. Name lookups are cached per host
+and shared by every probe of that host, failures included. --check-hosts
+resolves names from a hosts-format file instead of DNS, so a check can run
+against local stand-ins (loopback listeners).
+
+The result is applied before anything is rendered:
+
+- report: convert everything and list the unreachable bookmarks (default);
+- skip: leave unreachable bookmarks out;
+- tag: move them into a group named after --check-tag, nested like a
+  MobaXterm subfolder ("Unreachable\\<group>").
+"""
+import sys
+import time
+# asyncio, socket and ipaddress are imported where used: only --check needs them
+from typing import Iterable, Iterator, NamedTuple
+
+from moba_common import Entry
+from moba_store import EntryStore
+
+DEFAULT_CONCURRENCY = 512
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_TAG = "Unreachable"
+ACTIONS = ("report", "skip", "tag")
+
+class Probe(NamedTuple):
+    status: str      # ok | resolved | unresolved | refused | timeout | unreachable
+    detail: str
+    seconds: float
+
+    @property
+    def reachable(self) -> bool:
+        return self.status in ("ok", "resolved")
+
+def read_hosts_file(path: str) -> dict[str, list[str]]:
+    """name (lowercased) -> addresses, from an /etc/hosts style file."""
+    hosts: dict[str, list[str]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if len(fields) < 2:
+                continue
+            for name in fields[1:]:
+                hosts.setdefault(name.lower(), []).append(fields[0])
+    return hosts
+
+def max_open_files(default: int = 1024) -> int:
+    try:
+        import resource
+    except ImportError:   # not on Unix
+        return default
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return default if soft == resource.RLIM_INFINITY else soft
+
+class Checker:
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 hosts: dict[str, list[str]] | None = None):
+        # every probe holds a socket: stay clear of the open file limit
+        self.concurrency = max(1, min(concurrency, max_open_files() - 64))
+        self.timeout = timeout
+        self.hosts = hosts
+        self.lookups: dict = {}   # host -> asyncio.Task resolving it
+
+    async def _lookup(self, host: str) -> list[str]:
+        import asyncio, socket
+        if self.hosts is not None:
+            addrs = self.hosts.get(host.lower())
+            if not addrs:
+                raise socket.gaierror(socket.EAI_NONAME, "not in the hosts file")
+            return addrs
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM), self.timeout)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+
+    async def resolve(self, host: str) -> list[str]:
+        """Addresses of host; one lookup per host, shared by all its probes."""
+        import asyncio, ipaddress
+        try:
+            return [str(ipaddress.ip_address(host))]
+        except ValueError:
+            pass
+        task = self.lookups.get(host)
+        if task is None:
+            task = self.lookups[host] = asyncio.ensure_future(self._lookup(host))
+        return await asyncio.shield(task)
+
+    async def probe(self, host: str, port: str) -> Probe:
+        import asyncio
+        t0 = time.perf_counter()
+        elapsed = lambda: time.perf_counter() - t0
+        try:
+            addrs = await self.resolve(host)
+        except asyncio.TimeoutError:
+            return Probe("unresolved", "lookup timed out", elapsed())
+        except OSError as exc:
+            return Probe("unresolved", exc.strerror or str(exc), elapsed())
+        if not port.isdigit():
+            return Probe("resolved", addrs[0], elapsed())
+
+        result = None
+        for addr in addrs:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(addr, int(port)), self.timeout)
+            except asyncio.TimeoutError:
+                result = Probe("timeout", f"{addr}:{port}", elapsed())
+                continue
+            except ConnectionRefusedError:
+                result = Probe("refused", f"{addr}:{port}", elapsed())
+                continue
+            except OSError as exc:
+                result = Probe("unreachable", f"{addr}:{port}: {exc.strerror or exc}", elapsed())
+                continue
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return Probe("ok", f"{addr}:{port}", elapsed())
+        return result
+
+    async def run(self, targets: Iterable[tuple[str, str]]) -> dict[tuple[str, str], Probe]:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        loop = asyncio.get_running_loop()
+        # getaddrinfo blocks a thread per lookup; the default pool is a handful
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=min(self.concurrency, 64)))
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(target):
+            async with limit:
+                return target, await self.probe(*target)
+
+        results = {}
+        for done in asyncio.as_completed([bounded(t) for t in targets]):
+            target, probe = await done
+            results[target] = probe
+        return results
+
+    def check(self, targets: Iterable[tuple[str, str]]) -> dict[tuple[str, str], Probe]:
+        import asyncio
+        return asyncio.run(self.run(targets))
+
+def tag_group(group: str | None, tag: str = DEFAULT_TAG) -> str:
+    """The group an unreachable bookmark of group is moved to by --check tag."""
+    return f"{tag}\\{group}" if group else tag
+
+def check_entries(entries: Iterable[Entry], checker: Checker, action: str = "report",
+                  tag: str = DEFAULT_TAG) -> Iterator[Entry]:
+    """Probe every entry now; returns the entries to convert, per action.
+
+    A summary and every unreachable bookmark are printed to stderr.
+    """
+    store = EntryStore(entries)
+    pairs = zip(store.column("host"), store.column("port"))
+    targets = list(dict.fromkeys((h, p) for h, p in pairs if h))
+    t0 = time.perf_counter()
+    results = checker.check(targets)
+    elapsed = time.perf_counter() - t0
+
+    counts: dict[str, int] = {}
+    for probe in results.values():
+        counts[probe.status] = counts.get(probe.status, 0) + 1
+    unreachable = set()
+    for i, e in enumerate(store):
+        probe = results.get((e.host, e.port))
+        if probe is not None and not probe.reachable:
+            unreachable.add(i)
+            verb = {"skip": "Skipping", "tag": "Tagging"}.get(action, "Unreachable")
+            print(f"{verb}: {e.group or ''}/{e.name} -> {e.host}:{e.port} ({probe.status}: {probe.detail})",
+                  file=sys.stderr)
+    summary = ", ".join(f"{n} {s}" for s, n in sorted(counts.items()))
+    print(f"Checked {len(targets)} host/port pairs ({len(checker.lookups)} lookups) of {len(store)} entries "
+          f"in {elapsed:.2f}s: {summary or 'nothing to check'}; {len(unreachable)} entries unreachable.",
+          file=sys.stderr)
+
+    if action == "skip":
+        return (e for i, e in enumerate(store) if i not in unreachable)
+    if action == "tag":
+        return (e._replace(group=tag_group(e.group, tag)) if i in unreachable else e
+                for i, e in enumerate(store))
+    return iter(store)
+
+def checked(entries: Iterable[Entry], args) -> Iterable[Entry]:
+    """entries, probed and filtered per --check (unchanged without it)."""
+    if not getattr(args, "check", None):
+        return entries
+    hosts = read_hosts_file(args.check_hosts) if args.check_hosts else None
+    checker = Checker(args.check_concurrency, args.check_timeout, hosts)
+    return check_entries(entries, checker, args.check, args.check_tag)
+
+def add_check_args(parser) -> None:
+    parser.add_argument("--check", nargs="?", const="report", choices=ACTIONS,
+                        help="Resolve and TCP-probe every host first; report (default), skip or tag "
+                             "the unreachable bookmarks")
+    parser.add_argument("--check-concurrency", type=int, default=DEFAULT_CONCURRENCY, metavar="N",
+                        help=f"--check: probes in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--check-timeout", type=float, default=DEFAULT_TIMEOUT, metavar="SECONDS",
+                        help=f"--check: timeout for each lookup and connect (default: {DEFAULT_TIMEOUT:g})")
+    parser.add_argument("--check-hosts", metavar="FILE",
+                        help="--check: resolve names from this hosts-format file only, not DNS")
+    parser.add_argument("--check-tag", default=DEFAULT_TAG, metavar="GROUP",
+                        help=f"--check tag: group to move unreachable bookmarks under (default: {DEFAULT_TAG})")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Shared parsing core for the moba2* converters.
+
+A MobaXterm bookmarks export looks like:
+
+    [Bookmarks_1]
+    SubRep=Servers
+    ImgNum=0
+    web-01=#109#0%10.57.1.10%22%root%%-1%-1%%%%%0%0%0%...
+
+Every converter reads it through iter_entries() and hands the resulting
+Entry tuples to one or more backends (see run_backends()).
+"""
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Union
+
+from moba_ini import ExportIndex
+
+# paths
+HOME = str(Path.home())
+DEFAULT_SRC = "./moba_bookmarks.txt"
+
+class Entry(NamedTuple):
+    name: str
+    protocol: str   # a SessionType.protocol, e.g. SSH | TELNET | RDP
+    host: str
+    port: str
+    user: str
+    key_path: str
+    group: str | None
+
+class SessionType(NamedTuple):
+    protocol: str
+    default_port: str
+    # positions in the '%'-split right-hand side (None = not present for this type)
+    host: int | None
+    port: int | None
+    user: int | None
+    key: int | None = None
+    # narrow (older / hand-edited) SSH records keep the key path at index 8
+    short_key: int | None = None
+
+# The right-hand side of each entry is split by '%'
+# Example right side:
+# "#109#0%10.57.1.10%22%root%%-1%-1%%%22%%0%0%0%_ProfileDir_\.ssh\id_ed25519%%-1%..."
+#   index 0 -> "#109#0"   (type code: "#<icon>#<session type>")
+#   index 1.. -> per-type fields, see SESSION_TYPES
+#
+# The icon number can be changed by the user in MobaXterm; the session type
+# after the second '#' is what identifies the protocol.
+SESSION_TYPES: dict[str, SessionType] = {
+    "0":  SessionType("SSH",     "22",   host=1, port=2, user=3, key=14, short_key=8),
+    "1":  SessionType("TELNET",  "23",   host=1, port=2, user=3),
+    "2":  SessionType("RSH",     "514",  host=1, port=None, user=3),
+    "3":  SessionType("XDMCP",   "177",  host=1, port=2, user=None),
+    "4":  SessionType("RDP",     "3389", host=1, port=2, user=3),
+    "5":  SessionType("VNC",     "5900", host=1, port=2, user=None),
+    "6":  SessionType("FTP",     "21",   host=1, port=2, user=3),
+    "7":  SessionType("SFTP",    "22",   host=1, port=2, user=3),
+    "8":  SessionType("SERIAL",  "",     host=None, port=None, user=None),
+    "9":  SessionType("FILE",    "",     host=None, port=None, user=None),
+    "10": SessionType("SHELL",   "",     host=None, port=None, user=None),
+    "11": SessionType("BROWSER", "",     host=1, port=None, user=None),
+    "12": SessionType("MOSH",    "22",   host=1, port=2, user=3),
+    "13": SessionType("S3",      "",     host=None, port=None, user=None),
+    "14": SessionType("WSL",     "",     host=None, port=None, user=None),
+}
+# exports that only carry the icon number ("#109", "#98")
+LEGACY_ICON_TYPES = {"109": SESSION_TYPES["0"], "98": SESSION_TYPES["1"]}
+UNKNOWN_TYPE = SessionType("UNKNOWN", "", host=1, port=2, user=3)
+SHORT_RECORD = 15  # records with fewer fields use SessionType.short_key
+
+_type_cache: dict[str, SessionType] = {}
+
+def decode_type(code: str) -> SessionType:
+    """Map a type code like "#109#0" to its SessionType (memoized per code)."""
+    t = _type_cache.get(code)
+    if t is None:
+        _, _, rest = code.partition("#")
+        icon, _, kind = rest.partition("#")
+        kind = kind.split("#", 1)[0]
+        t = SESSION_TYPES.get(kind) or (LEGACY_ICON_TYPES.get(icon, UNKNOWN_TYPE) if not kind else UNKNOWN_TYPE)
+        _type_cache[code] = t
+    return t
+
+def normalize_key_path(key_path: str, home: str | None = None) -> str:
+    # "_ProfileDir_\.ssh\id_ed25519" -> "$HOME/.ssh/id_ed25519"
+    key_path = key_path.strip().replace("_ProfileDir_\\", "").replace("\\", "/")
+    if key_path and not key_path.startswith("/"):
+        key_path = f"{home or HOME}/{key_path}"
+    return key_path
+
+def moba_key_path(key_path: str, home: str | None = None) -> str:
+    # inverse of normalize_key_path: "$HOME/.ssh/id_ed25519" -> "_ProfileDir_\.ssh\id_ed25519"
+    home = home or HOME
+    if key_path.startswith(f"{home}/"):
+        return "_ProfileDir_\\" + key_path[len(home) + 1:].replace("/", "\\")
+    return key_path
+
+def parse_line(name: str, rhs: str, group: str | None, home: str | None = None) -> Entry:
+    parts = rhs.split('%')
+    n = len(parts)
+    t = decode_type(parts[0])
+
+    def field(i: int | None) -> str:
+        return parts[i].strip() if i is not None and i < n else ""
+
+    key_pos = t.key if n >= SHORT_RECORD else t.short_key
+    key_path = field(key_pos)
+    if "\\" not in key_path and "/" not in key_path:
+        key_path = ""  # flags like "0" / "-1", not a path
+
+    return Entry(
+        name=name.strip(),
+        protocol=t.protocol,
+        host=field(t.host),
+        port=field(t.port) or t.default_port,
+        user=field(t.user),
+        key_path=normalize_key_path(key_path, home) if key_path else "",
+        group=(group.strip() if group else None),
+    )
+
+def iter_entries(lines: Iterable[str], home: str | None = None, select=None) -> Iterator[Entry]:
+    """Entries of an export's lines. select, a moba_filter.Selection, drops
+    bookmarks before they are parsed."""
+    current_group = None
+    in_bookmarks = True  # lines before any [section] (hand-made snippets) count
+    group_ok = select is None or select.group_ok(None)
+    for raw_line in lines:
+        line = raw_line.strip()
+
+        # Skip blank and comment lines
+        if not line or line.startswith("#"):
+            continue
+
+        # Detect group blocks like:
+        # [Bookmarks_1]
+        # SubRep=Servers
+        # Any other [section] of a full MobaXterm.ini is skipped.
+        if line.startswith("["):
+            in_bookmarks = line.startswith("[Bookmarks")
+            current_group = None
+            group_ok = select is None or select.group_ok(None)
+            continue
+        if not in_bookmarks:
+            continue
+        if line.startswith("SubRep="):
+            current_group = line.split("=", 1)[1].strip()
+            group_ok = select is None or select.group_ok(current_group)
+            continue
+        if not group_ok:
+            continue
+
+        # skip ImgNum, etc
+        if line.startswith("ImgNum="):
+            continue
+        if "=" not in line:
+            continue
+
+        name, rhs = line.split("=", 1)
+        if select is not None and not select.match(name, rhs):
+            continue
+        yield parse_line(name, rhs, current_group, home)
+
+def read_entries(src_file: str | bytes, groups: Iterable[str] | None = None,
+                 home: str | None = None, select=None, cache=None) -> Iterator[Entry]:
+    """Entries of a file (or of an export's raw bytes), decoding only its
+    [Bookmarks*] sections.
+
+    groups restricts the result to the named SubRep= groups ("" selects the
+    root group); the other sections are never decoded. home replaces $HOME
+    in key paths (``_ProfileDir_``). select, a moba_filter.Selection, also
+    skips the sections of groups it rules out and drops bookmarks before
+    they are parsed. cache, a moba_cache.ParseCache, loads the parsed
+    export from an earlier run instead (and saves it on a miss).
+    """
+    with ExportIndex(src_file) as index:
+        if cache is not None:
+            yield from cache.entries(index, groups, home, select)
+            return
+        where = select.group_ok if select is not None else None
+        yield from iter_entries(index.iter_lines(groups, where), home, select)
+
+# what the convert() functions accept: a file name, the raw bytes of an
+# export, or its lines
+Source = Union[str, "os.PathLike[str]", bytes, Iterable[str]]
+
+def open_entries(source: Source, groups: Iterable[str] | None = None,
+                 home: str | None = None, select=None, cache=None) -> Iterator[Entry]:
+    if isinstance(source, (str, os.PathLike)):
+        return read_entries(os.fspath(source), groups, home, select, cache)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return read_entries(source, groups, home, select, cache)
+    entries = iter_entries(source, home, select)
+    if groups is None:
+        return entries
+    wanted = set(groups)
+    return (e for e in entries if (e.group or "") in wanted)
+
+class ConvertResult(NamedTuple):
+    """What one backend did in a convert() call."""
+    backend: str
+    target: str
+    created: int
+    updated: int
+    unchanged: int
+    removed: int
+    skipped: int
+    written: list[str]   # files written (nothing in a dry run)
+    failed: list         # WriteResult of every failed write
+
+class EntryTemplate:
+    """A profile builder turned into memoized templates.
+
+    build(entry) -> str is the readable line-by-line builder of a backend. It
+    runs once per entry *shape* (protocol plus which fields are empty) on an
+    Entry of placeholders, and the result is cut at the placeholders into its
+    constant blocks: later entries of the same shape only join those blocks
+    with their own fields. Calling the template gives exactly what build()
+    would have returned, as long as build() only tests the fields other than
+    protocol for emptiness (``e.port or "22"``, never ``e.port == "22"``).
+    The first entry of every shape is checked against build(); a shape whose
+    template disagrees is built entry by entry.
+    """
+    _SLOT = "\0{}\0"
+    _SLOTS = re.compile(r"\0(\d)\0")
+
+    def __init__(self, build: Callable[[Entry], str]):
+        self.build = build
+        # shape -> (first block, [(field index, block after it)]); None: call build()
+        self.cache: dict[tuple, tuple[str, list[tuple[int, str]]] | None] = {}
+
+    def _compile(self, shape: tuple) -> tuple[str, list[tuple[int, str]]]:
+        protocol = shape[1]
+        fields = [
+            protocol if i == 1 else (self._SLOT.format(i) if present else (None if f == "group" else ""))
+            for i, (f, present) in enumerate(zip(Entry._fields, shape))
+        ]
+        parts = self._SLOTS.split(self.build(Entry(*fields)))
+        return parts[0], [(int(i), block) for i, block in zip(parts[1::2], parts[2::2])]
+
+    @staticmethod
+    def _render(template: tuple[str, list[tuple[int, str]]], e: Entry) -> str:
+        first, rest = template
+        out = [first]
+        for i, block in rest:
+            out.append(e[i])
+            out.append(block)
+        return "".join(out)
+
+    def __call__(self, e: Entry) -> str:
+        shape = (bool(e.name), e.protocol, bool(e.host), bool(e.port), bool(e.user), bool(e.key_path), bool(e.group))
+        try:
+            template = self.cache[shape]
+        except KeyError:
+            template = self._compile(shape)
+            text = self.build(e)
+            if self._render(template, e) != text:
+                template = None
+            self.cache[shape] = template
+            return text
+        return self.build(e) if template is None else self._render(template, e)
+
+def require_file(src_file: str) -> None:
+    # Validate input file exists for a clearer error message ("-" is stdin)
+    if src_file != "-" and not os.path.isfile(src_file):
+        print(f"Error: input file not found: {src_file}", file=sys.stderr)
+        sys.exit(1)
+
+def add_common_args(parser) -> None:
+    parser.add_argument("-f", "--file", dest="src_file", default=DEFAULT_SRC,
+                        help=f"Path to MobaXterm bookmarks export, '-' for stdin (default: {DEFAULT_SRC})")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="Preview actions without creating any files")
+    parser.add_argument("-g", "--group", dest="groups", action="append", metavar="NAME",
+                        help="Only convert this SubRep= group (repeatable; default: all groups)")
+
+def run_backends(entries: Iterable[Entry], backends: list, stats=None) -> tuple[float, dict[str, float]]:
+    """Stream every entry to every backend in a single pass.
+
+    A backend is any object with a ``name`` attribute and ``add(entry)`` /
+    ``close()`` methods. Returns the seconds spent parsing and a
+    ``{backend name: seconds}`` map covering add() and close().
+
+    stats, a moba_stats.Stats, additionally gets wall and CPU time per stage
+    and the file writes of each backend's ``writer``.
+    """
+    clock = time.perf_counter
+    cpu = time.thread_time if stats is not None else (lambda: 0.0)
+    parse_time = parse_cpu = 0.0
+    timings = {b.name: 0.0 for b in backends}
+    cpu_times = {b.name: 0.0 for b in backends}
+    count = 0
+
+    it = iter(entries)
+    while True:
+        t0, c0 = clock(), cpu()
+        e = next(it, None)
+        parse_time += clock() - t0
+        parse_cpu += cpu() - c0
+        if e is None:
+            break
+        count += 1
+        for b in backends:
+            t0, c0 = clock(), cpu()
+            b.add(e)
+            timings[b.name] += clock() - t0
+            cpu_times[b.name] += cpu() - c0
+
+    if stats is not None:
+        stats.entries += count
+        stats.add("parse", parse_time, parse_cpu, count)
+        for b in backends:
+            stats.add(f"{b.name}.render", timings[b.name], cpu_times[b.name], count)
+
+    for b in backends:
+        t0, c0 = clock(), cpu()
+        b.close()
+        dt = clock() - t0
+        timings[b.name] += dt
+        if stats is not None:
+            stats.add(f"{b.name}.write", dt, cpu() - c0)
+            writer = getattr(b, "writer", None)
+            if writer is not None:
+                stats.record_writes(writer.completed)
+    return parse_time, timings
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""A long-running conversion service on a Unix socket.
+
+Callers that convert many exports, such as a provisioning service, pay
+interpreter startup, imports and a parse on every converter run. The daemon
+pays them once. It keeps the most recently used parsed exports in memory, in
+front of the on-disk parse cache (moba_cache), and runs requests on a pool
+of threads.
+
+The protocol is JSON lines: every request is one JSON object on one line,
+and the reply is one JSON object on one line. A connection may send any
+number of requests; they are answered in order. Use one connection per
+request you want to run concurrently.
+
+    {"op": "convert",
+     "export": "/srv/exports/alice.txt",     # or "export_text": "...",
+                                              # or "export_base64": "..."
+     "home": "/home/alice",                   # default: the daemon user's home
+     "targets": ["remmina", "putty"],         # default: remmina, putty, rabbit
+     "groups": ["Servers"],                   # like -g
+     "filters": {"include_host": ["*.dc1.example"], "exclude_port": ["23"]},
+     "options": {"dry_run": false, "force": false, "prune": false},
+     "archive": "tar.gz",                     # optional: return the profiles
+     "id": 17}                                # optional: echoed in the reply
+
+    -> {"ok": true, "id": 17, "seconds": 0.041,
+        "results": [{"backend": "remmina", "target": "...", "created": 3, ...,
+                     "written": [...], "failed": [], "seconds": 0.012, "error": null},
+                    {"backend": "rabbit", "error": "No such file or directory: ..."}],
+        "archive": "<base64>"}               # with "archive"
+
+    {"op": "stats"}  -> uptime, requests per op, errors, latency, cache counters
+    {"op": "ping"}   -> {"ok": true, "pid": ...}
+
+A backend that cannot be set up (e.g. no Rabbit Favorite.ini in the home)
+gets an "error" in its result, as in moba2fleet, and the others still run.
+A failed request gets {"ok": false, "error": "..."}. Requests for the same
+home run one at a time (dry runs included: they read the manifests);
+archive requests never wait.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+from moba_bundle import Bundle
+from moba_cache import CACHE_DIR, ParseCache, add_cache_args
+from moba_common import HOME, open_entries, run_backends
+from moba_filter import selection_from_options
+from moba_writer import add_writer_args
+from moba2all import DEFAULT_TARGETS, TARGETS
+from moba2fleet import error_text, make_backend
+
+def default_socket_path() -> str:
+    runtime = os.getenv("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "mobaxterm-sessions.sock")
+    return f"/tmp/mobaxterm-sessions-{os.getuid()}.sock"
+
+SOCKET_PATH = default_socket_path()
+DEFAULT_WORKERS = 4
+DEFAULT_MEMORY = 16          # parsed exports kept in memory
+LINE_LIMIT = 256 << 20       # one request line may carry a whole export
+ARCHIVE_FORMATS = ("tar", "tar.gz", "tgz", "tar.bz2", "tar.xz", "zip")
+OPTIONS = ("dry_run", "force", "prune")
+
+def result_dict(r, seconds: float) -> dict:
+    d = r._asdict()
+    d["failed"] = [{"path": w.path, "error": w.error.strerror or str(w.error)} for w in r.failed]
+    d["seconds"] = round(seconds, 3)
+    d["error"] = None
+    return d
+
+class Daemon:
+    def __init__(self, cache: ParseCache, workers: int = DEFAULT_WORKERS, write_jobs: int = 1,
+                 fsync: bool = False):
+        from concurrent.futures import ThreadPoolExecutor
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.write_opts = {"write_jobs": write_jobs, "fsync": fsync}
+        self.home_locks: dict[str, threading.Lock] = {}
+        self.locks_lock = threading.Lock()
+        # counters below are only touched on the event loop
+        self.started = time.time()
+        self.requests: dict[str, int] = {}
+        self.errors = 0
+        self.in_flight = 0
+        self.connections = 0
+        self.convert_seconds = self.max_seconds = 0.0
+        self.files_written = 0
+
+    def home_lock(self, home: str) -> threading.Lock:
+        with self.locks_lock:
+            return self.home_locks.setdefault(os.path.realpath(home), threading.Lock())
+
+    def source(self, req: dict):
+        given = [k for k in ("export", "export_text", "export_base64") if req.get(k) is not None]
+        if len(given) != 1:
+            raise ValueError("give exactly one of export, export_text or export_base64")
+        if given[0] == "export":
+            path = req["export"]
+            if not os.path.isabs(path):
+                raise ValueError(f"export must be an absolute path: {path!r}")
+            if not os.path.isfile(path):
+                raise FileNotFoundError(2, "No such file", path)
+            return path
+        if given[0] == "export_text":
+            return req["export_text"].encode("utf-8")
+        return base64.b64decode(req["export_base64"], validate=True)
+
+    def convert(self, req: dict) -> dict:
+        """Run one convert request (in a worker thread)."""
+        source = self.source(req)
+        targets = req.get("targets") or list(DEFAULT_TARGETS)
+        unknown = [t for t in targets if t not in TARGETS]
+        if unknown:
+            raise ValueError(f"unknown targets {unknown} (choose from {', '.join(TARGETS)})")
+        home = req.get("home") or HOME
+        if not os.path.isabs(home):
+            raise ValueError(f"home must be an absolute path: {home!r}")
+        options = req.get("options") or {}
+        unknown = [k for k in options if k not in OPTIONS]
+        if unknown:
+            raise ValueError(f"unknown options {unknown} (choose from {', '.join(OPTIONS)})")
+        opts = {**self.write_opts, **{k: bool(options.get(k)) for k in OPTIONS}}
+        select = selection_from_options(req.get("filters") or {})
+
+        archive, out = req.get("archive"), None
+        if archive:
+            if archive not in ARCHIVE_FORMATS:
+                raise ValueError(f"unknown archive format {archive!r} (choose from {', '.join(ARCHIVE_FORMATS)})")
+            if opts["dry_run"]:
+                raise ValueError("archive cannot be combined with dry_run")
+            out = io.BytesIO()
+            bundle = Bundle(f"profiles.{archive}", home, out)
+        # two requests on one home would race on its manifests and files (the
+        # backends read them when they are made)
+        results, backends, timings = {}, [], {}
+        with bundle if archive else nullcontext(), nullcontext() if archive else self.home_lock(home):
+            for t in dict.fromkeys(targets):
+                try:
+                    backends.append(make_backend(t, home, opts, bundle.writer() if archive else None))
+                except Exception as exc:
+                    results[t] = {"backend": t, "error": error_text(exc)}
+            if backends:
+                _, timings = run_backends(open_entries(source, req.get("groups"), home, select, self.cache),
+                                          backends)
+        for b in backends:
+            results[b.name] = result_dict(b.result(), timings[b.name])
+
+        reply = {"ok": True, "results": [results[t] for t in dict.fromkeys(targets)]}
+        if out is not None:
+            reply["archive"] = base64.b64encode(out.getvalue()).decode("ascii")
+        return reply
+
+    def stats(self) -> dict:
+        n = self.requests.get("convert", 0)
+        c = self.cache
+        return {
+            "ok": True, "pid": os.getpid(), "uptime": round(time.time() - self.started, 1),
+            "workers": self.workers, "in_flight": self.in_flight, "connections": self.connections,
+            "requests": dict(self.requests), "errors": self.errors, "files_written": self.files_written,
+            "convert_seconds": {"total": round(self.convert_seconds, 3),
+                                "mean": round(self.convert_seconds / n, 4) if n else 0.0,
+                                "max": round(self.max_seconds, 3)},
+            "cache": {"memory_hits": c.memory_hits, "disk_hits": c.hits, "misses": c.misses,
+                      "in_memory": len(c.recent), "directory": c.directory},
+        }
+
+    async def dispatch(self, line: bytes) -> dict:
+        t0 = time.perf_counter()
+        op, req = "invalid", {}
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("a request is a JSON object")
+            op = str(req.get("op", "convert"))
+            if op == "convert":
+                self.in_flight += 1
+                try:
+                    reply = await asyncio.get_running_loop().run_in_executor(self.pool, self.convert, req)
+                finally:
+                    self.in_flight -= 1
+            elif op == "stats":
+                reply = self.stats()
+            elif op == "ping":
+                reply = {"ok": True, "pid": os.getpid()}
+            else:
+                raise ValueError(f"unknown op {op!r} (convert, stats or ping)")
+        except Exception as exc:
+            reply = {"ok": False, "error": error_text(exc)}
+        seconds = time.perf_counter() - t0
+
+        self.requests[op] = self.requests.get(op, 0) + 1
+        if not reply["ok"]:
+            self.errors += 1
+        if op == "convert":
+            self.convert_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.files_written += sum(len(r.get("written", ())) for r in reply.get("results", ()))
+            what = req.get("export") or "(inline export)"
+            status = "ok" if reply["ok"] else f"error: {reply['error']}"
+            print(f"[{time.strftime('%H:%M:%S')}] convert {what} -> {req.get('home') or HOME}: {status} "
+                  f"({seconds:.3f}s)", file=sys.stderr)
+        if isinstance(req, dict) and "id" in req:
+            reply["id"] = req["id"]
+        if op == "convert" and reply["ok"]:
+            reply["seconds"] = round(seconds, 3)
+        return reply
+
+    async def client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # longer than LINE_LIMIT: the rest of the stream cannot be framed
+                    writer.write(b'{"ok": false, "error": "request too large"}\n')
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    reply = await self.dispatch(line)
+                    writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+def claim_socket(path: str) -> None:
+    """Remove a stale socket at path; SystemExit if a daemon is listening."""
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+    print(f"Error: a daemon is already listening on {path}", file=sys.stderr)
+    sys.exit(1)
+
+async def serve(daemon: Daemon, path: str) -> None:
+    claim_socket(path)
+    old = os.umask(0o177)   # the socket is the user's only, from the start
+    try:
+        server = await asyncio.start_unix_server(daemon.client, path, limit=LINE_LIMIT)
+    finally:
+        os.umask(old)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Listening on {path} ({daemon.workers} workers); Ctrl-C to stop.", file=sys.stderr)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        daemon.pool.shutdown(wait=True)
+
+def call(request: dict, path: str = SOCKET_PATH, timeout: float | None = None) -> dict:
+    """Send one request to the daemon at path and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        s.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("the daemon closed the connection without a reply")
+    return json.loads(line)
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve conversions on a Unix socket, with warm caches.")
+    ap.add_argument("-s", "--socket", default=SOCKET_PATH, help=f"Socket path (default: {SOCKET_PATH})")
+    ap.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, metavar="N",
+                    help=f"Requests converted at once (default: {DEFAULT_WORKERS})")
+    ap.add_argument("--memory-cache", type=int, default=DEFAULT_MEMORY, metavar="N",
+                    help=f"Parsed exports kept in memory (default: {DEFAULT_MEMORY})")
+    add_cache_args(ap)
+    add_writer_args(ap)
+    ap.add_argument("--call", metavar="JSON",
+                    help="Client mode: send one request to the running daemon and print its reply")
+    args = ap.parse_args()
+
+    if args.call is not None:
+        try:
+            reply = call(json.loads(args.call), args.socket)
+        except ValueError as exc:
+            print(f"Error: invalid request: {exc}", file=sys.stderr)
+            sys.exit(2)
+        except OSError as exc:
+            print(f"Error: cannot reach the daemon on {args.socket}: {exc.strerror or exc}", file=sys.stderr)
+            sys.exit(1)
+        json.dump(reply, sys.stdout, indent=2)
+        print()
+        sys.exit(0 if reply.get("ok") else 1)
+
+    cache = ParseCache(CACHE_DIR if args.cache else None, args.cache_size << 20, memory=max(0, args.memory_cache))
+    daemon = Daemon(cache, args.workers, args.write_jobs, args.fsync)
+    asyncio.run(serve(daemon, args.socket))
+
+if __name__ == "__main__":
+    main()
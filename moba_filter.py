@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Selection filters (--include-* / --exclude-*) shared by the converters.
+
+The options are compiled once into a Selection. Group tests are answered
+once per SubRep group, so whole [Bookmarks*] sections are skipped without
+being decoded. match(name, rhs) tests the other fields on the raw line,
+before parse_line() runs: the name needs no split at all, and protocol,
+host and port only need the first three '%'-fields. For a small subset of
+a big export, the cost is mostly the scan.
+
+Within one option kind the patterns are alternatives (any may match); the
+kinds combine with AND, and any exclude drops the bookmark.
+"""
+import argparse
+import fnmatch
+import re
+from typing import Iterable
+
+from moba_common import SESSION_TYPES, Entry, decode_type
+
+PROTOCOLS = sorted({t.protocol for t in SESSION_TYPES.values()})
+
+def _globs(patterns: Iterable[str], ignore_case: bool = False) -> re.Pattern | None:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns), re.I if ignore_case else 0)
+
+def _regexes(patterns: Iterable[str]) -> re.Pattern | None:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+class HostTest:
+    """Host globs (case-insensitive) and CIDR ranges, e.g. "*.dc1.example", "10.20.0.0/16"."""
+
+    def __init__(self, patterns: Iterable[str]):
+        globs, self.networks = [], []
+        for p in patterns:
+            net = parse_cidr(p)
+            if net is None:
+                globs.append(p)
+            else:
+                self.networks.append(net)
+        self.glob = _globs(globs, ignore_case=True)
+
+    def __call__(self, host: str) -> bool:
+        if self.glob is not None and self.glob.match(host):
+            return True
+        if self.networks:
+            import ipaddress
+            try:
+                ip = ipaddress.ip_address(host)
+            except ValueError:
+                return False   # a name: CIDR ranges never match it (no DNS lookups)
+            return any(ip in net for net in self.networks)
+        return False
+
+class PortTest:
+    """Ports and port ranges, e.g. "22", "2200-2299"."""
+
+    def __init__(self, specs: Iterable[str]):
+        self.ranges = [parse_port_range(s) for s in specs]
+        self.cache: dict[str, bool] = {}
+
+    def __call__(self, port: str) -> bool:
+        hit = self.cache.get(port)
+        if hit is None:
+            n = int(port) if port.isdigit() else -1
+            hit = self.cache[port] = any(lo <= n <= hi for lo, hi in self.ranges)
+        return hit
+
+def parse_cidr(value: str):
+    if "/" not in value:
+        return None
+    import ipaddress   # only CIDR patterns need it
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+def parse_port_range(value: str) -> tuple[int, int]:
+    lo, sep, hi = value.strip().partition("-")
+    if not lo.isdigit() or (sep and not hi.isdigit()):
+        raise ValueError(f"invalid port or port range: {value!r}")
+    return int(lo), int(hi if sep else lo)
+
+class Selection:
+    def __init__(self, include_groups=(), exclude_groups=(), include_names=(), exclude_names=(),
+                 include_hosts=(), exclude_hosts=(), include_protocols=(), exclude_protocols=(),
+                 include_ports=(), exclude_ports=()):
+        self.include_group = _globs(include_groups)
+        self.exclude_group = _globs(exclude_groups)
+        self.include_name = _regexes(include_names)
+        self.exclude_name = _regexes(exclude_names)
+        self.include_host = HostTest(include_hosts) if include_hosts else None
+        self.exclude_host = HostTest(exclude_hosts) if exclude_hosts else None
+        self.include_port = PortTest(include_ports) if include_ports else None
+        self.exclude_port = PortTest(exclude_ports) if exclude_ports else None
+        self.include_protocol = {p.upper() for p in include_protocols} or None
+        self.exclude_protocol = {p.upper() for p in exclude_protocols}
+        self.needs_fields = any(t is not None for t in (
+            self.include_host, self.exclude_host, self.include_port, self.exclude_port, self.include_protocol,
+        )) or bool(self.exclude_protocol)
+        self._groups: dict[str | None, bool] = {}
+
+    def group_ok(self, group: str | None) -> bool:
+        """Whether bookmarks of this SubRep group can be selected at all."""
+        ok = self._groups.get(group)
+        if ok is None:
+            g = (group or "").strip()
+            ok = ((self.include_group is None or self.include_group.match(g) is not None)
+                  and (self.exclude_group is None or self.exclude_group.match(g) is None))
+            self._groups[group] = ok
+        return ok
+
+    def match(self, name: str, rhs: str) -> bool:
+        """Test one "name=rhs" bookmark line (its group already passed group_ok)."""
+        if self.include_name is not None or self.exclude_name is not None:
+            name = name.strip()
+            if self.include_name is not None and self.include_name.search(name) is None:
+                return False
+            if self.exclude_name is not None and self.exclude_name.search(name) is not None:
+                return False
+        if not self.needs_fields:
+            return True
+
+        # same field positions as parse_line; host and port are never past index 2
+        parts = rhs.split("%", 3)
+        t = decode_type(parts[0])
+        if not self._protocol_ok(t.protocol):
+            return False
+        if self.include_host is not None or self.exclude_host is not None:
+            host = parts[t.host].strip() if t.host is not None and t.host < len(parts) else ""
+            if not self._host_ok(host):
+                return False
+        if self.include_port is not None or self.exclude_port is not None:
+            port = (parts[t.port].strip() if t.port is not None and t.port < len(parts) else "") or t.default_port
+            if not self._port_ok(port):
+                return False
+        return True
+
+    def entry_ok(self, e: Entry) -> bool:
+        """match() for an already parsed entry (group included)."""
+        if not self.group_ok(e.group):
+            return False
+        if self.include_name is not None and self.include_name.search(e.name) is None:
+            return False
+        if self.exclude_name is not None and self.exclude_name.search(e.name) is not None:
+            return False
+        return not self.needs_fields or (self._protocol_ok(e.protocol) and self._host_ok(e.host)
+                                         and self._port_ok(e.port))
+
+    def _protocol_ok(self, protocol: str) -> bool:
+        if self.include_protocol is not None and protocol not in self.include_protocol:
+            return False
+        return protocol not in self.exclude_protocol
+
+    def _host_ok(self, host: str) -> bool:
+        if self.include_host is not None and not self.include_host(host):
+            return False
+        return self.exclude_host is None or not self.exclude_host(host)
+
+    def _port_ok(self, port: str) -> bool:
+        if self.include_port is not None and not self.include_port(port):
+            return False
+        return self.exclude_port is None or not self.exclude_port(port)
+
+def _regex(value: str) -> str:
+    try:
+        re.compile(value)
+    except re.error as exc:
+        raise ValueError(f"invalid regular expression {value!r}: {exc}") from None
+    return value
+
+def _protocol(value: str) -> str:
+    if value.upper() not in PROTOCOLS:
+        raise ValueError(f"unknown protocol {value!r} (choose from {', '.join(PROTOCOLS)})")
+    return value.upper()
+
+def _port(value: str) -> str:
+    parse_port_range(value)
+    return value
+
+def _host(value: str) -> str:
+    if "/" in value and parse_cidr(value) is None:
+        raise ValueError(f"invalid CIDR range {value!r}")
+    return value
+
+def _checked(check):
+    def convert(value: str) -> str:
+        try:
+            return check(value)
+        except ValueError as exc:
+            raise argparse.ArgumentTypeError(str(exc)) from None
+    convert.__name__ = check.__name__.lstrip("_")
+    return convert
+
+FILTER_OPTIONS = (
+    # (option suffix, Selection keyword suffix, value check, metavar, what)
+    ("group", "groups", str, "GLOB", "SubRep group matches this glob"),
+    ("name", "names", _regex, "REGEX", "name matches this regular expression"),
+    ("host", "hosts", _host, "GLOB|CIDR", "host matches this glob or lies in this CIDR range"),
+    ("protocol", "protocols", _protocol, "PROTO", "protocol is this (SSH, TELNET, RDP, ...)"),
+    ("port", "ports", _port, "PORT[-PORT]", "port is this or in this range"),
+)
+
+def add_filter_args(parser) -> None:
+    g = parser.add_argument_group("selection (repeatable; kinds combine with AND, any exclude wins)")
+    for opt, _, check, metavar, what in FILTER_OPTIONS:
+        kind = _checked(check) if check is not str else str
+        g.add_argument(f"--include-{opt}", dest=f"include_{opt}", action="append", type=kind, metavar=metavar,
+                       help=f"Only convert bookmarks whose {what}")
+        g.add_argument(f"--exclude-{opt}", dest=f"exclude_{opt}", action="append", type=kind, metavar=metavar,
+                       help=f"Skip bookmarks whose {what}")
+
+def selection_from_options(options: dict[str, list[str]]) -> Selection | None:
+    """The Selection for {"include_group": [...], "exclude_port": [...], ...}
+    (the option names without dashes); ValueError for a bad name or value."""
+    kinds = {opt: (key, check) for opt, key, check, *_ in FILTER_OPTIONS}
+    kwargs = {}
+    for name, values in options.items():
+        side, _, opt = name.partition("_")
+        if side not in ("include", "exclude") or opt not in kinds:
+            raise ValueError(f"unknown filter {name!r}")
+        key, check = kinds[opt]
+        if isinstance(values, str):
+            values = [values]
+        if values:
+            kwargs[f"{side}_{key}"] = [check(v) for v in values]
+    return Selection(**kwargs) if kwargs else None
+
+def selection_from_args(args) -> Selection | None:
+    """The Selection for the --include-*/--exclude-* options, or None if none was given."""
+    kwargs = {}
+    for opt, key, *_ in FILTER_OPTIONS:
+        for side in ("include", "exclude"):
+            values = getattr(args, f"{side}_{opt}", None)
+            if values:
+                kwargs[f"{side}_{key}"] = values
+    return Selection(**kwargs) if kwargs else None
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Memory-mapped reader for MobaXterm exports and full MobaXterm.ini files.
+
+A complete MobaXterm.ini is mostly non-bookmark sections. ExportIndex maps the
+raw bytes, records the byte range of every ``[Bookmarks*]`` section together
+with its ``SubRep=`` group name, and decodes only the sections that are asked
+for. The encoding is detected from the raw bytes: a UTF-8 or UTF-16 BOM wins,
+otherwise UTF-8 is tried and cp1252 (what MobaXterm writes on most Windows
+installs) is the fallback. iter_stream_lines() reads an export that can't be
+mapped (stdin) the same way, line by line.
+"""
+import codecs
+import hashlib
+import itertools
+import mmap
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+class Section(NamedTuple):
+    header: str          # e.g. "Bookmarks_12"
+    group: str | None    # SubRep= value, None for an empty group
+    start: int           # byte offset of the header line
+    end: int             # byte offset just past the section
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+def detect_encoding(head: bytes) -> tuple[str, int]:
+    """Return (codec, BOM length) for the first bytes of a file."""
+    for bom, codec in _BOMS:
+        if head.startswith(bom):
+            return codec, len(bom)
+    # UTF-16 without BOM: every other byte of ASCII text is NUL
+    if len(head) >= 4 and head[1] == 0 and head[3] == 0 and head[0] and head[2]:
+        return "utf-16-le", 0
+    return "utf-8", 0
+
+STREAM_CHUNK = 64 << 10   # bytes read from a stream at a time
+
+def iter_stream_lines(stream, chunk_size: int = STREAM_CHUNK) -> Iterator[str]:
+    """Decoded lines of an export read from a binary stream (stdin), a chunk
+    at a time: memory is bounded by the longest line, not the export.
+
+    The encoding is detected as for ExportIndex. With no BOM, a line that is
+    not valid UTF-8 switches the rest of the stream to cp1252 (a file
+    switches from that whole section on).
+    """
+    head = stream.read(4)
+    codec, bom = detect_encoding(head)
+    chunks = itertools.chain([head[bom:]], iter(lambda: stream.read(chunk_size), b""))
+
+    if codec.startswith("utf-16"):
+        decoder, rest = codecs.getincrementaldecoder(codec)(), ""
+        for chunk in chunks:
+            *lines, rest = (rest + decoder.decode(chunk)).split("\n")
+            yield from lines
+        yield rest + decoder.decode(b"", final=True)
+        return
+
+    def decode(raw: bytes) -> str:
+        nonlocal codec
+        if codec == "utf-8":
+            try:
+                return raw.decode("utf-8")
+            except UnicodeDecodeError:
+                codec = "cp1252"
+        return raw.decode(codec, errors="replace")
+
+    rest = b""
+    for chunk in chunks:
+        *lines, rest = (rest + chunk).split(b"\n")
+        for raw in lines:
+            yield decode(raw)
+    yield decode(rest)
+
+class ExportIndex:
+    def __init__(self, path: str | bytes):
+        """path is a file name, or the raw bytes of an export already in memory."""
+        if isinstance(path, (bytes, bytearray, memoryview)):
+            self.path, self._file, self.data = None, None, bytes(path)
+        else:
+            self.path = path
+            self._file = open(path, "rb")
+            try:
+                self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file: nothing to map
+                self.data = b""
+        self.encoding, self.bom = detect_encoding(self.data[:4])
+        self.unit = 2 if self.encoding.startswith("utf-16") else 1
+        self.sections = self._scan()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _enc(self, text: str) -> bytes:
+        return text.encode(self.encoding)
+
+    def _find_line_start(self, needle: bytes, start: int, end: int) -> int:
+        """Offset of the next line starting with needle in [start, end), or -1."""
+        data, nl, unit = self.data, self._enc("\n"), self.unit
+        pos = start
+        while True:
+            pos = data.find(needle, pos, end)
+            if pos < 0:
+                return -1
+            aligned = (pos - self.bom) % unit == 0
+            if aligned and (pos == self.bom or data[pos - len(nl):pos] == nl):
+                return pos
+            pos += 1
+
+    def _scan(self) -> list[Section]:
+        data, size = self.data, len(self.data)
+        header, next_header = self._enc("[Bookmarks"), self._enc("[")
+        subrep, nl = self._enc("SubRep="), self._enc("\n")
+
+        sections = []
+        pos = self._find_line_start(header, self.bom, size)
+        while pos >= 0:
+            end = self._find_line_start(next_header, pos + len(header), size)
+            end = size if end < 0 else end
+            line_end = data.find(nl, pos, end)
+            name = self._decode(data[pos:end if line_end < 0 else line_end]).strip()[1:-1]
+
+            group = None
+            g = self._find_line_start(subrep, pos, end)
+            if g >= 0:
+                g_end = data.find(nl, g, end)
+                group = self._decode(data[g + len(subrep):end if g_end < 0 else g_end]).strip() or None
+
+            sections.append(Section(name, group, pos, end))
+            pos = self._find_line_start(header, end, size) if end < size else -1
+
+        if not sections and self._find_line_start(next_header, self.bom, size) < 0:
+            # a bare list of entries without any [section]: take it whole
+            sections.append(Section("", None, self.bom, size))
+        return sections
+
+    def _decode(self, raw: bytes) -> str:
+        try:
+            return raw.decode(self.encoding, errors="replace" if self.encoding == "cp1252" else "strict")
+        except UnicodeDecodeError:
+            if self.encoding != "utf-8":
+                raise
+            # not UTF-8 after all: treat the whole file as cp1252 from here on
+            # (replacing the five byte values cp1252 leaves undefined)
+            self.encoding = "cp1252"
+            return raw.decode(self.encoding, errors="replace")
+
+    def select(self, groups: Iterable[str] | None = None,
+               where: Callable[[str | None], bool] | None = None) -> list[Section]:
+        """Sections of the named groups (default: all) for whose group where() is true."""
+        sections = self.sections
+        if groups is not None:
+            wanted = set(groups)
+            sections = [s for s in sections if (s.group or "") in wanted]
+        if where is not None:
+            sections = [s for s in sections if where(s.group)]
+        return list(sections)
+
+    def section_lines(self, s: Section) -> list[str]:
+        return self._decode(self.data[s.start:s.end]).split("\n")
+
+    def encodings(self, sections: Iterable[Section]) -> list[str]:
+        """The codec section_lines() would decode each of sections with, in
+        order, for decoding them elsewhere (moba_parallel)."""
+        codecs_ = []
+        for s in sections:
+            if self.encoding == "utf-8":
+                raw = self.data[s.start:s.end]
+                if not raw.isascii():
+                    self._decode(raw)   # falls back to cp1252 if need be
+            codecs_.append(self.encoding)
+        return codecs_
+
+    def split(self, s: Section, size: int) -> list[tuple[int, int, list[str]]]:
+        """s cut at line starts into pieces of about size bytes, as
+        [(start, end, lines to read before the piece)]: every piece after the
+        first is read behind a copy of the header and SubRep= line, so it parses
+        as it does within the whole section. A section that can't be cut
+        safely (UTF-16, more than one SubRep=, any other "[") stays whole.
+        """
+        data, start, end = self.data, s.start, s.end
+        if end - start <= size or self.unit != 1:
+            return [(start, end, [])]
+        subrep = data.find(b"SubRep=", start, end)
+        if subrep >= 0:
+            if data.find(b"SubRep=", subrep + 1, end) >= 0 or self._find_line_start(b"SubRep=", start, end) != subrep:
+                return [(start, end, [])]
+            body = data.find(b"\n", subrep, end)
+            lead = ["[Bookmarks]", f"SubRep={s.group or ''}"]
+        else:
+            body = data.find(b"\n", start, end) if s.header else start
+            lead = ["[Bookmarks]"]
+        if body < 0 or data.find(b"[", body, end) >= 0:
+            return [(start, end, [])]
+
+        pieces, prefix = [], []
+        while end - start > size:
+            cut = data.find(b"\n", max(start + size, body), end) + 1
+            if cut <= 0 or cut >= end:
+                break
+            pieces.append((start, cut, prefix))
+            start, prefix = cut, lead
+        pieces.append((start, end, prefix))
+        return pieces
+
+    def iter_lines(self, groups: Iterable[str] | None = None,
+                   where: Callable[[str | None], bool] | None = None) -> Iterator[str]:
+        """Decoded lines of the selected bookmark sections only."""
+        for s in self.select(groups, where):
+            yield from self.section_lines(s)
+
+    def digest(self, s: Section) -> str:
+        """Hash of a section's raw bytes after its header line.
+
+        The header is left out so that renumbering ([Bookmarks_3] becoming
+        [Bookmarks_4] when a group is inserted above) is not a change.
+        """
+        start = s.start
+        if s.header:
+            nl = self._enc("\n")
+            line_end = self.data.find(nl, s.start, s.end)
+            start = s.end if line_end < 0 else line_end + len(nl)
+        # hash straight from the mapping, without copying the section
+        with memoryview(self.data) as view, view[start:s.end] as body:
+            return hashlib.sha1(body).hexdigest()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Per-target manifest so re-runs only touch profiles that changed.
+
+For every file a backend wrote, the manifest records the hash of the source
+entry and the hash of the rendered content. On the next run an entry whose
+hashes still match (and whose file still exists) is skipped instead of being
+rewritten. Files recorded in the manifest whose bookmark disappeared from the
+export can be pruned.
+
+Manifests live outside the profile directories (PuTTY treats every file in
+its sessions directory as a session), under
+``$XDG_STATE_HOME/mobaxterm-sessions/``.
+"""
+import hashlib
+import json
+import os
+
+from moba_common import HOME, Entry
+from moba_names import NameIndex, entry_id
+
+MANIFEST_VERSION = 1
+STATE_DIR = os.path.join(os.getenv("XDG_STATE_HOME", f"{HOME}/.local/state"), "mobaxterm-sessions")
+
+def entry_hash(e: Entry) -> str:
+    return hashlib.sha1("\x1f".join(v or "" for v in e).encode("utf-8")).hexdigest()
+
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def manifest_path(backend: str, target_dir) -> str:
+    # one manifest per (backend, target directory)
+    digest = hashlib.sha1(os.path.abspath(str(target_dir)).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(STATE_DIR, f"{backend}-{digest}.json")
+
+class Manifest:
+    def __init__(self, path: str | None, target_dir, force: bool = False):
+        """path None: an in-memory manifest (archive output) that starts empty,
+        ignores what is in target_dir and is never saved."""
+        self.path = path
+        self.target_dir = str(target_dir)
+        self.force = force
+        self.files: dict[str, dict[str, str]] = {}
+        self.seen: set[str] = set()
+        self.status: dict[str, str] = {}   # this run's outcome per file
+        # bookmark identities a partial run (--watch) re-read; only their
+        # files may be pruned. None: the whole export was read.
+        self.scope: set[str] | None = None
+        self.created = self.updated = self.unchanged = self.removed = self.failed = 0
+
+        if path is None:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            # unreadable manifest: behave like a first run
+            return
+        if data.get("version") == MANIFEST_VERSION and data.get("target") == self.target_dir:
+            self.files = data.get("files", {})
+
+    def name_index(self) -> NameIndex:
+        """Scan the target directory once; files this manifest owns keep their owner."""
+        return NameIndex(self.target_dir if self.path else None, {name: rec.get("id", "") for name, rec in self.files.items()})
+
+    def check(self, filename: str, e: Entry, content: str, exists: bool, hashes=None) -> str:
+        """Classify filename as created / updated / unchanged and record it.
+
+        hashes: (entry_hash(e), content_hash(content)) if already computed.
+        """
+        if self.path is None:
+            # in memory (archive, NDJSON): nothing is kept per file, so a
+            # stream of any length takes no more memory
+            status = "updated" if exists else "created"
+            setattr(self, status, getattr(self, status) + 1)
+            return status
+        src, out = hashes or (entry_hash(e), content_hash(content))
+        rec = self.files.get(filename)
+        self.seen.add(filename)
+
+        if not exists:
+            status = "created"
+        elif (not self.force and rec is not None
+              and rec.get("src") == src and rec.get("out") == out):
+            status = "unchanged"
+        else:
+            status = "updated"
+
+        self.files[filename] = {"id": entry_id(e.name, e.group), "src": src, "out": out}
+        self.status[filename] = status
+        setattr(self, status, getattr(self, status) + 1)
+        return status
+
+    def forget(self, filename: str) -> None:
+        # used when a write failed, so the next run retries it
+        self.files.pop(filename, None)
+        status = self.status.pop(filename, None)
+        if status is not None:
+            setattr(self, status, getattr(self, status) - 1)
+            self.failed += 1
+
+    def stale(self) -> list[str]:
+        """Files recorded by an earlier run whose bookmark is gone."""
+        return sorted(name for name, rec in self.files.items()
+                      if name not in self.seen and (self.scope is None or rec.get("id") in self.scope))
+
+    def prune(self, dry_run: bool = False, verbose: bool = True) -> list[str]:
+        removed = []
+        for name in self.stale():
+            path = os.path.join(self.target_dir, name)
+            if dry_run:
+                if verbose:
+                    print(f"[dry-run] Would remove {path}")
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                del self.files[name]
+                if verbose:
+                    print(f"Removed {path}")
+            removed.append(path)
+        self.removed += len(removed)
+        return removed
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "target": self.target_dir, "files": self.files},
+                      f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        text = (f"Created: {self.created}, Updated: {self.updated}, "
+                f"Unchanged: {self.unchanged}, Removed: {self.removed}")
+        if self.failed:
+            text += f", Failed: {self.failed}"
+        return text
+
+def add_sync_args(parser) -> None:
+    parser.add_argument("--force", action="store_true",
+                        help="Rewrite every profile even if the manifest says it is unchanged")
+    parser.add_argument("--prune", action="store_true",
+                        help="Remove profiles written by earlier runs whose bookmark is no longer in the export")
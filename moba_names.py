@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Collision-free, stable output file names for a target directory.
+
+The directory is scanned once. NameIndex then answers every "does this file
+exist?" from memory and remembers the names handed out during the run, so two
+bookmarks that map to the same file name (same name in different SubRep
+groups, or names that sanitize to the same string) never overwrite each
+other. The fallback names are deterministic (group, then a short hash of the
+bookmark identity), and names recorded in the manifest are reused, so a
+bookmark keeps its file across runs.
+"""
+import hashlib
+import os
+import sys
+from typing import Callable
+
+def entry_id(name: str, group: str | None) -> str:
+    """Identity of a bookmark inside an export: its group and name."""
+    return f"{group or ''}/{name}"
+
+class NameIndex:
+    def __init__(self, directory, owned: dict[str, str] | None = None):
+        """directory None: start from an empty directory (archive output)."""
+        self.directory = str(directory)
+        self.existing = set()
+        if directory is not None:
+            try:
+                with os.scandir(self.directory) as it:
+                    self.existing = {d.name for d in it}
+            except FileNotFoundError:
+                pass
+        # file name -> bookmark identity, from the manifest of earlier runs
+        # ("" for records written before identities were stored)
+        self.owned = owned or {}
+        # without a manifest, files already in the directory are assumed to
+        # come from an earlier run of the converter and may be overwritten
+        self.adopt = not self.owned
+        self.by_id: dict[str, str] = {}
+        for filename, ident in self.owned.items():
+            if ident:
+                self.by_id.setdefault(ident, filename)
+        self.claimed: set[str] = set()
+        # made in this run: (identity, wanted, got, reason)
+        self.renames: list[tuple[str, str, str, str]] = []
+
+    def exists(self, filename: str) -> bool:
+        return filename in self.existing
+
+    def _free(self, filename: str, identity: str) -> bool:
+        if filename in self.claimed:
+            return False
+        owner = self.owned.get(filename)
+        if owner is not None:
+            return owner in ("", identity)
+        return self.adopt or filename not in self.existing
+
+    def claim(self, name: str, group: str | None, render: Callable[[str], str]) -> str:
+        """Return the file name for bookmark (group, name).
+
+        render turns a display string into a file name (sanitizing or
+        encoding it and adding the extension).
+        """
+        identity = entry_id(name, group)
+        wanted = render(name)
+        prev = self.by_id.get(identity)
+
+        if prev is not None and prev not in self.claimed:
+            # reported in the run that picked it
+            self.claimed.add(prev)
+            return prev
+        if self._free(wanted, identity):
+            got = wanted
+        else:
+            digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:6]
+            candidates = ([render(f"{name}-{group}")] if group else []) + [render(f"{name}-{digest}")]
+            got = next((c for c in candidates if self._free(c, identity)), None)
+            n = 2
+            while got is None:
+                c = render(f"{name}-{digest}-{n}")
+                got = c if self._free(c, identity) else None
+                n += 1
+
+        self.claimed.add(got)
+        if got != wanted:
+            self.renames.append((identity, wanted, got, f"{wanted} is taken"))
+        return got
+
+    def report(self) -> None:
+        for identity, wanted, got, reason in self.renames:
+            print(f"Renamed: {identity!r} -> {got} ({reason})", file=sys.stderr)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""--parallel: parse and render the export on every core.
+
+The export is cut into chunks of whole [Bookmarks*] sections (ExportIndex
+already knows their byte ranges), so every chunk carries its own SubRep group.
+A section too large for one chunk is cut at line starts after its SubRep line,
+and each piece after the first is read behind a copy of those two lines
+(ExportIndex.split()). Worker processes decode a chunk, parse it and call each
+backend's render(), which only depends on the entry. The parent takes the
+chunks back in source order and hands every entry with its rendered profiles
+to the backends' add_rendered(), which does all that depends on the order:
+file name claims, the manifest, Rabbit's File_N indexes and RootCount. The
+files written are byte for byte those of a serial run.
+
+- A backend without add_rendered() (moba2ssh renders whole groups in close())
+  gets the parsed entries through add(), as before.
+- The parse cache is not used: the parse is what the workers share out.
+- At most two chunks per worker are in flight, so memory is bounded by the
+  chunk size, not the export's.
+"""
+import mmap
+import os
+import sys
+from collections import deque
+from itertools import islice
+from typing import Iterator
+
+from moba_cache import cache_from_args
+from moba_check import checked
+from moba_common import Entry, iter_entries, open_entries, read_entries, run_backends
+from moba_ini import ExportIndex, iter_stream_lines
+
+MIN_CHUNK = 256 << 10   # bytes; smaller chunks cost more to ship than to parse
+CHUNKS_PER_JOB = 4      # so that one slow chunk does not leave the other workers idle
+
+# (export bytes, home, selection, render functions) of a worker process
+_worker = None
+
+def _init(source, home, select, renders) -> None:
+    global _worker
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:   # empty file
+                data = b""
+    else:
+        data = source
+    _worker = (data, home, select, renders)
+
+def _parse_chunk(pieces: list[tuple[int, int, str, list[str]]]) -> list[tuple[Entry, tuple]]:
+    data, home, select, renders = _worker
+    lines = []
+    for start, end, codec, prefix in pieces:
+        lines.extend(prefix)
+        text = data[start:end].decode(codec, errors="replace" if codec == "cp1252" else "strict")
+        lines.extend(text.split("\n"))
+    return [(e, tuple(render(e) if render else None for render in renders))
+            for e in iter_entries(lines, home, select)]
+
+def plan_chunks(index: ExportIndex, sections, size: int) -> list[list[tuple[int, int, str, list[str]]]]:
+    """sections in chunks of about size bytes, each [(start, end, codec, lines
+    to read first)] in source order."""
+    chunks, chunk, chunk_size = [], [], 0
+    for s, codec in zip(sections, index.encodings(sections)):
+        for start, end, prefix in index.split(s, size):
+            chunk.append((start, end, codec, prefix))
+            chunk_size += end - start
+            if chunk_size >= size:
+                chunks.append(chunk)
+                chunk, chunk_size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+class _Prerendered:
+    """A backend as run_backends() sees it: add() passes on what the workers
+    rendered for the entry."""
+    def __init__(self, backend, i: int, feed: "_Feed"):
+        self.backend, self.i, self.feed = backend, i, feed
+        self.name = backend.name
+        self.writer = getattr(backend, "writer", None)
+
+    def add(self, e: Entry) -> None:
+        self.backend.add_rendered(e, self.feed.rendered[self.i])
+
+    def close(self) -> None:
+        self.backend.close()
+
+class _Feed:
+    def __init__(self):
+        self.rendered = ()   # of the entry last yielded
+
+    def entries(self, pool, chunks, window: int) -> Iterator[Entry]:
+        todo = iter(chunks)
+        pending = deque(pool.submit(_parse_chunk, c) for c in islice(todo, window))
+        while pending:
+            results = pending.popleft().result()
+            for c in islice(todo, 1):
+                pending.append(pool.submit(_parse_chunk, c))
+            for e, self.rendered in results:
+                yield e
+
+def run_parallel(source: str | bytes, backends: list, jobs: int, groups=None, home: str | None = None,
+                 select=None, stats=None) -> tuple[float, dict[str, float]]:
+    """run_backends() over an export (a file name or its raw bytes), parsed
+    and rendered in up to jobs processes. "parse" then times the waits for
+    the workers."""
+    with ExportIndex(source) as index:
+        sections = index.select(groups, select.group_ok if select is not None else None)
+        size = max(MIN_CHUNK, sum(s.end - s.start for s in sections) // (jobs * CHUNKS_PER_JOB))
+        chunks = plan_chunks(index, sections, size)
+    if jobs < 2 or len(chunks) < 2:
+        # not worth starting processes
+        return run_backends(read_entries(source, groups, home, select), backends, stats)
+
+    from concurrent.futures import ProcessPoolExecutor   # slow to import; only --parallel needs it
+    renders = [b.render if hasattr(b, "add_rendered") else None for b in backends]
+    feed = _Feed()
+    fed = [_Prerendered(b, i, feed) if render else b for i, (b, render) in enumerate(zip(backends, renders))]
+    with ProcessPoolExecutor(min(jobs, len(chunks)), initializer=_init,
+                             initargs=(source, home, select, renders)) as pool:
+        return run_backends(feed.entries(pool, chunks, 2 * jobs), fed, stats)
+
+def run_export(args, backends: list, select=None, stats=None) -> tuple[float, dict[str, float]]:
+    """What a converter's main() runs: args.src_file ("-": stdin) through
+    run_backends(), checked and cached per the options, or split over
+    --parallel processes."""
+    if getattr(args, "parallel", 0):
+        return run_parallel(args.src_file, backends, args.parallel, args.groups, select=select, stats=stats)
+    if args.src_file == "-":
+        # stdin: streamed line by line, so not cached
+        entries = open_entries(iter_stream_lines(sys.stdin.buffer), args.groups, select=select)
+    else:
+        entries = read_entries(args.src_file, args.groups, select=select, cache=cache_from_args(args))
+    return run_backends(checked(entries, args), backends, stats)
+
+def check_parallel_args(parser, args) -> None:
+    if args.parallel and (getattr(args, "check", None) or getattr(args, "watch", False)):
+        parser.error("--parallel cannot be combined with --check or --watch")
+    if args.parallel is not None and args.parallel < 1:
+        parser.error("--parallel: N must be at least 1")
+
+def add_parallel_args(parser) -> None:
+    jobs = os.cpu_count() or 1
+    parser.add_argument("--parallel", type=int, nargs="?", const=jobs, default=None, metavar="N",
+                        help=f"Parse and render the export in N processes (default N: {jobs}, one per core)")
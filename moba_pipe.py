@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Pipe mode: read the export from stdin (-f -) and write NDJSON to stdout.
+
+``-f -`` streams the export through moba_ini.iter_stream_lines() into the
+usual parse, one line at a time, instead of mapping a file. ``--ndjson``
+replaces the profile directories with one JSON object per line on stdout:
+
+- entries: every parsed bookmark, {"name", "protocol", "host", "port",
+  "user", "key_path", "group"}; nothing is converted;
+- profiles: every file a converter would write, {"path", "content"}, the
+  path being where it would have been written.
+
+A record is written as soon as its bookmark is parsed. Entries mode keeps
+nothing per bookmark. Profiles mode goes through the backends the way
+--archive does (NdjsonOutput has the Bundle interface): no manifest is read
+or saved and nothing local is touched. What remains per bookmark is what
+the converters need to keep names unique, plus Rabbit's Favorite.ini, which
+comes last. While stdout carries NDJSON, everything the converters print
+goes to stderr.
+"""
+import json
+import os
+import sys
+
+from moba_writer import WriteResult
+
+MODES = ("entries", "profiles")
+
+class NdjsonOutput:
+    def __init__(self, out=None):
+        """out: a binary file object (default: stdout), left open."""
+        self.out = out
+        self.count = 0
+        self.nbytes = 0
+        self._stdout = None
+
+    def emit(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        self.out.write(line)
+        self.count += 1
+        self.nbytes += len(line)
+
+    def add(self, path, content: str) -> None:
+        self.emit({"path": str(path), "content": content})
+
+    def writer(self) -> "NdjsonWriter":
+        return NdjsonWriter(self)
+
+    def summary(self) -> str:
+        return f"NDJSON: {self.count} records, {self.nbytes} bytes to stdout"
+
+    def __enter__(self) -> "NdjsonOutput":
+        if self.out is None:
+            self.out = sys.stdout.buffer
+            # the records own stdout; progress and summaries go to stderr
+            sys.stdout.flush()
+            self._stdout, sys.stdout = sys.stdout, sys.stderr
+        return self
+
+    def __exit__(self, exc_type, *exc) -> bool:
+        try:
+            self.out.flush()
+        except BrokenPipeError:
+            exc_type = BrokenPipeError
+        finally:
+            if self._stdout is not None:
+                sys.stdout, self._stdout = self._stdout, None
+        if exc_type is BrokenPipeError:
+            # the reader went away (e.g. "| head"): stop quietly, as cat does
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.__stdout__.fileno())
+            sys.exit(141)
+        return False
+
+class NdjsonWriter:
+    """ProfileWriter stand-in for one backend; see NdjsonOutput.
+
+    Records are written through at once and not kept: completed stays empty.
+    """
+    local = False
+    fsync = False
+
+    def __init__(self, output: NdjsonOutput):
+        self.output = output
+        self.completed: list[WriteResult] = []
+
+    def write(self, path, content: str) -> None:
+        self.output.add(path, content)
+
+    def close(self) -> list[WriteResult]:
+        return []
+
+class EntrySink:
+    """A backend (for run_backends()) that prints every entry as a record."""
+    name = "entries"
+    writer = None
+    failed = ()
+
+    def __init__(self, output: NdjsonOutput):
+        self.output = output
+
+    def add(self, e) -> None:
+        self.output.emit(e._asdict())
+
+    def close(self) -> None:
+        pass
+
+def dump_entries(args, select=None) -> None:
+    """--ndjson entries: the export per args (-f, -g, selection, --check) as
+    NDJSON on stdout."""
+    from moba_parallel import run_export
+    with NdjsonOutput() as output:
+        run_export(args, [EntrySink(output)], select)
+
+def open_pipe(parser, args) -> NdjsonOutput | None:
+    """The output for --ndjson profiles, or None; rejects what pipe mode
+    can't combine with."""
+    if args.src_file == "-" and (getattr(args, "parallel", 0) or getattr(args, "watch", False)):
+        parser.error("-f - (stdin) cannot be combined with --parallel or --watch")
+    if not args.ndjson:
+        return None
+    if args.dry_run or getattr(args, "watch", False) or getattr(args, "archive", None):
+        parser.error("--ndjson cannot be combined with --dry-run, --watch or --archive")
+    if args.ndjson == "profiles" and getattr(args, "all_dirs", False):
+        parser.error("--ndjson cannot be combined with --all-dirs")
+    return NdjsonOutput() if args.ndjson == "profiles" else None
+
+def add_pipe_args(parser) -> None:
+    parser.add_argument("--ndjson", choices=MODES,
+                        help="Write one JSON object per parsed bookmark (entries) or per profile file "
+                             "(profiles: path and content) to stdout instead of converting")
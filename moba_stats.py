@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""--stats / --profile support shared by the converters.
+
+run_backends() feeds a Stats object with wall and CPU time per stage:
+
+    parse            reading and tokenizing the export
+    <backend>.render rendering profiles and queueing them (and writing them,
+                     with --write-jobs 1)
+    <backend>.write  draining the writer, fsync, manifest / Favorite.ini
+
+plus the per-file write results, from which bytes written and the slowest
+writes are reported.
+"""
+import contextlib
+import heapq
+import json
+import sys
+import time
+
+class Stats:
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.stages: dict[str, list[float]] = {}   # name -> [wall, cpu, calls]
+        self.entries = 0
+        self.files_written = 0
+        self.bytes_written = 0
+        self.write_io_seconds = 0.0
+        self.slowest: list[tuple[float, str]] = []
+        self.started = time.perf_counter()
+        self.wall = 0.0
+
+    def add(self, stage: str, wall: float, cpu: float, calls: int = 1) -> None:
+        s = self.stages.get(stage)
+        if s is None:
+            s = self.stages[stage] = [0.0, 0.0, 0]
+        s[0] += wall
+        s[1] += cpu
+        s[2] += calls
+
+    def record_writes(self, results) -> None:
+        for r in results:
+            if r.error is None:
+                self.files_written += 1
+                self.bytes_written += r.nbytes
+            self.write_io_seconds += r.seconds
+        slowest = heapq.nlargest(self.top, ((r.seconds, r.path) for r in results))
+        self.slowest = heapq.nlargest(self.top, self.slowest + slowest)
+
+    def finish(self) -> None:
+        self.wall = time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        return {
+            "entries": self.entries,
+            "wall_seconds": round(self.wall, 6),
+            "entries_per_second": round(self.entries / self.wall, 1) if self.wall else 0.0,
+            "files_written": self.files_written,
+            "bytes_written": self.bytes_written,
+            "write_io_seconds": round(self.write_io_seconds, 6),
+            "stages": {name: {"wall_seconds": round(w, 6), "cpu_seconds": round(c, 6), "calls": n}
+                       for name, (w, c, n) in self.stages.items()},
+            "slowest_writes": [{"path": p, "seconds": round(s, 6)} for s, p in self.slowest],
+        }
+
+    def format_table(self) -> str:
+        out = [f"{'stage':<20} {'wall s':>9} {'cpu s':>9} {'calls':>9}"]
+        for name, (w, c, n) in self.stages.items():
+            out.append(f"{name:<20} {w:>9.3f} {c:>9.3f} {n:>9}")
+        eps = self.entries / self.wall if self.wall else 0.0
+        out.append("")
+        out.append(f"entries: {self.entries} in {self.wall:.3f}s ({eps:,.0f}/s)")
+        out.append(f"written: {self.files_written} files, {self.bytes_written:,} bytes "
+                   f"({self.write_io_seconds:.3f}s in file writes)")
+        if self.slowest:
+            out.append("slowest writes:")
+            for s, p in self.slowest:
+                out.append(f"  {s * 1000:9.2f} ms  {p}")
+        return "\n".join(out)
+
+    def report(self, fmt: str, stream=None) -> None:
+        stream = stream or sys.stderr
+        if fmt == "json":
+            json.dump(self.as_dict(), stream, indent=2)
+            stream.write("\n")
+        else:
+            print(self.format_table(), file=stream)
+
+@contextlib.contextmanager
+def profiling(path: str | None):
+    """Run the enclosed block under cProfile and dump the profile to path."""
+    if not path:
+        yield
+        return
+    import cProfile
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        print(f"Profile written to {path} (inspect with: python3 -m pstats {path})", file=sys.stderr)
+
+def add_stats_args(parser) -> None:
+    parser.add_argument("--stats", nargs="?", const="table", choices=("table", "json"),
+                        help="Print per-stage timing, throughput and slowest writes to stderr")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Run the conversion under cProfile and write the profile to FILE")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Columnar, interned storage for many entries.
+
+An Entry tuple with its own strings costs about 400 bytes, and buffering a
+multi-million-line export as tuples costs gigabytes even though most of its
+fields repeat: a few protocols, ports, users, key paths and groups. The
+EntryStore keeps
+
+- name and host, which are mostly unique, as UTF-8 text in one bytearray
+  each, with an array of end offsets;
+- protocol, port, user, key_path and group as an array of small integer
+  codes into a table of the distinct values (one copy of each string).
+
+where() and order_by() work on the columns and return arrays of row
+numbers. Tests and sort keys on an interned column are evaluated once per
+distinct value, not once per row. Entry tuples are only built when rows are
+read back, one at a time.
+
+to_bytes() / from_bytes() save and restore the columns as they are (see
+moba_cache), so loading a store costs a few buffer copies, not a parse.
+"""
+import marshal
+from array import array
+from itertools import compress
+from operator import and_
+from typing import Callable, Iterable, Iterator
+
+from moba_common import Entry
+
+TEXT_FIELDS = ("name", "host")
+INTERNED_FIELDS = ("protocol", "port", "user", "key_path", "group")
+DUMP_FORMAT = 1   # bump when the to_bytes() layout changes
+
+class _Text:
+    """A column of mostly unique strings."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array("Q")
+
+    def append(self, value: str) -> None:
+        self.data += value.encode("utf-8")
+        self.ends.append(len(self.data))
+
+    def __getitem__(self, i: int) -> str:
+        start = self.ends[i - 1] if i else 0
+        return self.data[start:self.ends[i]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data, start = self.data, 0
+        if data.isascii():
+            # byte offsets are character offsets: decode once, slice the str
+            data = data.decode("ascii")
+            for end in self.ends:
+                yield data[start:end]
+                start = end
+            return
+        for end in self.ends:
+            yield data[start:end].decode("utf-8")
+            start = end
+
+class _Interned:
+    """A column of repeating values: codes into a table of distinct values."""
+
+    def __init__(self):
+        self.values: list = []          # code -> value (None allowed, for group)
+        self.codes: dict = {}           # value -> code
+        self.rows = array("H")          # widened to "I" past 65535 distinct values
+
+    def append(self, value) -> None:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            if code == 0x10000:
+                self.rows = array("I", self.rows)
+        self.rows.append(code)
+
+    def __getitem__(self, i: int):
+        return self.values[self.rows[i]]
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.rows)
+
+    def set_values(self, values: list) -> None:
+        self.values = values
+        self.codes = {}
+        for code, v in enumerate(values):
+            self.codes.setdefault(v, code)
+
+class EntryStore:
+    def __init__(self, entries: Iterable[Entry] = ()):
+        self.columns: dict[str, _Text | _Interned] = {
+            f: (_Text() if f in TEXT_FIELDS else _Interned()) for f in Entry._fields
+        }
+        self._append = [c.append for c in self.columns.values()]
+        self.extend(entries)
+
+    def append(self, e: Entry) -> int:
+        """Add e; returns its row number."""
+        for add, value in zip(self._append, e):
+            add(value)
+        return len(self) - 1
+
+    def extend(self, entries: Iterable[Entry]) -> None:
+        for e in entries:
+            for add, value in zip(self._append, e):
+                add(value)
+
+    def __len__(self) -> int:
+        return len(self.columns["name"].ends)
+
+    def __getitem__(self, i: int) -> Entry:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("EntryStore index out of range")
+        return Entry(*(c[i] for c in self.columns.values()))
+
+    def __iter__(self) -> Iterator[Entry]:
+        return map(Entry._make, zip(*self.columns.values()))
+
+    def distinct(self, field: str) -> list:
+        """The distinct values of an interned field, in first-seen order."""
+        return list(self.columns[field].values)
+
+    def column(self, field: str) -> Iterator:
+        return iter(self.columns[field])
+
+    def mapped(self, field: str, fn: Callable) -> "EntryStore":
+        """A read-only view in which every value v of an interned field reads
+        as fn(v) (one call per distinct value); the columns are shared, so
+        self can be mapped again, e.g. from several threads."""
+        col, view = _Interned(), EntryStore()
+        col.set_values([fn(v) for v in self.columns[field].values])
+        col.rows = self.columns[field].rows
+        view.columns = {**self.columns, field: col}
+        view._append = None   # appending would corrupt the shared columns
+        return view
+
+    def to_bytes(self) -> bytes:
+        """The columns in binary form. marshal and array layouts are specific
+        to the Python version and machine: the result is a local cache, not
+        an exchange format."""
+        cols = []
+        for col in self.columns.values():
+            if isinstance(col, _Text):
+                cols.append((bytes(col.data), col.ends.tobytes()))
+            else:
+                cols.append((col.values, col.rows.typecode, col.rows.tobytes()))
+        return marshal.dumps((DUMP_FORMAT, Entry._fields, cols))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EntryStore":
+        """A store from to_bytes() output; ValueError if data is not one."""
+        try:
+            fmt, fields, cols = marshal.loads(data)
+        except (EOFError, TypeError, ValueError):
+            raise ValueError("not an EntryStore dump") from None
+        if fmt != DUMP_FORMAT or fields != Entry._fields:
+            raise ValueError("EntryStore dump of another format")
+        store = cls()
+        for col, saved in zip(store.columns.values(), cols):
+            if isinstance(col, _Text):
+                col.data = bytearray(saved[0])
+                col.ends.frombytes(saved[1])
+            else:
+                values, typecode, rows = saved
+                col.set_values(list(values))
+                col.rows = array(typecode)
+                col.rows.frombytes(rows)
+        return store
+
+    def rows(self, indices: Iterable[int] | None = None) -> Iterator[Entry]:
+        """Entries of the given rows, in that order (default: all)."""
+        if indices is None:
+            return iter(self)
+        return (self[i] for i in indices)
+
+    def where(self, indices: Iterable[int] | None = None, **tests) -> array:
+        """Row numbers whose fields pass every test, in row order.
+
+        A test is a value (equality) or a callable returning a bool, e.g.
+        ``store.where(protocol="SSH", group=lambda g: g and g.startswith("DC1"))``.
+        indices narrows an earlier result.
+        """
+        idx = range(len(self)) if indices is None else array("I", indices)
+        sel = None
+        text_tests = []
+        for field, test in tests.items():
+            col = self.columns[field]
+            check = test if callable(test) else (lambda v, want=test: v == want)
+            if isinstance(col, _Text):
+                text_tests.append((col, check))
+                continue
+            # interned: test each distinct value once, then look rows up
+            mask = bytes(bool(check(v)) for v in col.values)
+            codes = col.rows if indices is None else map(col.rows.__getitem__, idx)
+            hits = map(mask.__getitem__, codes)
+            sel = hits if sel is None else map(and_, sel, hits)
+        if sel is not None:
+            idx = array("I", compress(idx, sel))
+        for col, check in text_tests:
+            idx = array("I", compress(idx, map(check, map(col.__getitem__, idx))))
+        return idx if isinstance(idx, array) else array("I", idx)
+
+    def order_by(self, *fields: str, indices: Iterable[int] | None = None,
+                 key: Callable | None = None) -> array:
+        """Row numbers sorted by fields (stable; None sorts as ""), or by
+        key(value) of a single field."""
+        if key is not None and len(fields) != 1:
+            raise ValueError("key= needs exactly one field")
+        rows = list(range(len(self)) if indices is None else indices)
+        # one stable sort per field, least significant first
+        for field in reversed(fields):
+            col = self.columns[field]
+            if isinstance(col, _Interned):
+                # rank the distinct values once; rows then sort by integer rank
+                k = key or (lambda v: v or "")
+                rank = [0] * len(col.values)
+                for r, c in enumerate(sorted(range(len(col.values)), key=lambda c: k(col.values[c]))):
+                    rank[c] = r
+                keys = array("I", map(rank.__getitem__, col.rows))
+            else:
+                keys = list(col) if key is None else list(map(key, col))
+            rows.sort(key=keys.__getitem__)
+        return array("I", rows)
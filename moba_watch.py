@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""--watch: keep the profiles in sync with an export that keeps changing.
+
+The source file is polled with os.stat() from an asyncio loop (sleeping
+between polls, never spinning). When its size or mtime changes and then
+stays put for the debounce interval, every [Bookmarks*] section is hashed
+straight from the memory-mapped file and only the sections whose hash
+changed are parsed and handed to freshly created backends. The first pass
+converts the whole export. Rabbit's backend starts from the Favorite.ini and
+.rrc index the previous pass left (see RabbitBackend), so a partial pass
+does not read every .rrc again.
+"""
+import os
+import sys
+import time
+from typing import Callable, Iterator
+
+from moba_check import checked, tag_group
+from moba_common import Entry, iter_entries, run_backends
+from moba_filter import selection_from_args
+from moba_ini import ExportIndex, Section
+from moba_names import entry_id
+from moba_stats import Stats
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 1.0
+
+SectionKey = tuple[str, int]   # (SubRep group, occurrence of that group)
+
+class SectionWatcher:
+    """Section hashes and bookmark identities as of the last converted pass."""
+
+    def __init__(self, groups=None, select=None, tag: str | None = None):
+        self.groups = groups
+        self.select = select   # a moba_filter.Selection
+        # --check tag: a re-read bookmark may move into or out of this group
+        self.tag = tag
+        self.hashes: dict[SectionKey, str] | None = None   # None: nothing converted yet
+        self.ids: dict[SectionKey, set[str]] = {}
+        self.pending = None
+
+    def plan(self, index: ExportIndex) -> tuple[list[Section], set[str] | None, set[str] | None] | None:
+        """Sections to convert, the identities they held before and their
+        groups (the prune scope; both None on the first pass), or None if
+        nothing changed."""
+        current: dict[SectionKey, tuple[Section, str]] = {}
+        seen: dict[str, int] = {}
+        where = self.select.group_ok if self.select is not None else None
+        for s in index.select(self.groups, where):
+            g = s.group or ""
+            seen[g] = seen.get(g, 0) + 1
+            current[(g, seen[g])] = (s, index.digest(s))
+
+        old = self.hashes or {}
+        changed = [k for k, (_, h) in current.items() if old.get(k) != h]
+        removed = [k for k in old if k not in current]
+        # a group split over several sections is re-read whole: backends that
+        # write one file per group (moba2ssh) need all of its bookmarks
+        touched = {k[0] for k in changed + removed}
+        changed = [k for k in current if k[0] in touched]
+        if self.hashes is not None and not changed and not removed:
+            return None
+
+        scope = groups = None
+        if self.hashes is not None:
+            scope = set()
+            for k in changed + removed:
+                scope |= self.ids.get(k, set())
+            groups = touched | {tag_group(g, self.tag) for g in touched} if self.tag else touched
+        self.pending = ({k: h for k, (_, h) in current.items()}, {k: set() for k in changed}, removed)
+        return [current[k][0] for k in changed], scope, groups
+
+    def entries(self, index: ExportIndex, sections: list[Section]) -> Iterator[Entry]:
+        _, new_ids, _ = self.pending
+        for key, s in zip(new_ids, sections):
+            ids = new_ids[key]
+            for e in iter_entries(index.section_lines(s), select=self.select):
+                ids.add(entry_id(e.name, e.group))
+                if self.tag:
+                    ids.add(entry_id(e.name, tag_group(e.group, self.tag)))
+                yield e
+
+    def commit(self) -> None:
+        hashes, new_ids, removed = self.pending
+        for k in removed:
+            self.ids.pop(k, None)
+        self.ids.update(new_ids)
+        self.hashes = hashes
+        self.pending = None
+
+def file_signature(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None   # missing for a moment while a sync client replaces it
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+async def poll(path: str, on_change: Callable[[], None], interval: float, debounce: float) -> None:
+    import asyncio
+    last = None
+    while True:
+        sig = file_signature(path)
+        if sig is not None and sig != last:
+            # wait until the file has stopped changing
+            while True:
+                await asyncio.sleep(debounce)
+                settled = file_signature(path)
+                if settled == sig:
+                    break
+                sig = settled
+            if sig is not None:
+                last = sig
+                await asyncio.to_thread(on_change)
+        await asyncio.sleep(interval)
+
+def watch_export(args, make_backends: Callable[[], list], report: Callable[[list], None]) -> None:
+    """Convert args.src_file now and again after every change, until Ctrl-C.
+
+    make_backends() returns fresh backends for one pass; report(backends)
+    prints that pass's summary.
+    """
+    tag = args.check_tag if getattr(args, "check", None) == "tag" else None
+    watcher = SectionWatcher(args.groups, selection_from_args(args), tag)
+
+    def convert() -> None:
+        t0 = time.perf_counter()
+        try:
+            with ExportIndex(args.src_file) as index:
+                plan = watcher.plan(index)
+                if plan is None:
+                    print("No bookmark section changed.")
+                    return
+                sections, scope, groups = plan
+                backends = make_backends()
+                if scope is not None:
+                    for b in backends:
+                        if hasattr(b, "manifest"):
+                            b.manifest.scope = scope
+                        elif hasattr(b, "scope_groups"):
+                            b.scope_groups = groups
+                stats = Stats() if getattr(args, "stats", None) else None
+                run_backends(checked(watcher.entries(index, sections), args), backends, stats)
+        except (OSError, ValueError) as exc:
+            # e.g. the file was replaced mid-read; the next change retries
+            print(f"Error: could not convert {args.src_file}: {exc}", file=sys.stderr)
+            return
+        if any(b.failed for b in backends):
+            # keep the old hashes so these sections are converted again next time
+            watcher.pending = None
+        else:
+            watcher.commit()
+        what = "all sections" if scope is None else f"{len(sections)} changed section(s)"
+        print(f"[{time.strftime('%H:%M:%S')}] Converted {what} in {time.perf_counter() - t0:.2f}s")
+        report(backends)
+        if stats:
+            stats.finish()
+            stats.report(args.stats)
+
+    import asyncio   # only --watch needs it; keeps the converters quick to import
+    print(f"Watching {args.src_file} (every {args.interval:g}s, debounce {args.debounce:g}s); Ctrl-C to stop.")
+    try:
+        asyncio.run(poll(args.src_file, convert, args.interval, args.debounce))
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+def add_watch_args(parser) -> None:
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and re-convert the bookmark sections that change in the export")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, metavar="SECONDS",
+                        help=f"--watch: seconds between checks of the export (default: {DEFAULT_INTERVAL:g})")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, metavar="SECONDS",
+                        help=f"--watch: wait until the export has not changed for this long (default: {DEFAULT_DEBOUNCE:g})")
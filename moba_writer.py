@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Writer stage shared by the converters.
+
+Backends render a profile to a string and hand it to ProfileWriter.write();
+the file system work happens on a bounded thread pool so that slow creates
+(e.g. NFS-mounted homes) overlap instead of serializing the parse loop.
+close() waits for everything, optionally fsyncs each touched directory once,
+and returns one WriteResult per file in submission order.
+"""
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+DEFAULT_JOBS = 8
+# files handed to a worker at a time; amortizes the thread handoff, which
+# otherwise costs more than a local small-file create
+BATCH_SIZE = 32
+
+class WriteResult(NamedTuple):
+    path: str
+    nbytes: int
+    seconds: float
+    error: OSError | None
+
+def fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ProfileWriter:
+    local = True   # writes into the profile directories (see moba_bundle.BundleWriter)
+
+    def __init__(self, jobs: int = DEFAULT_JOBS, fsync: bool = False):
+        self.jobs = max(1, jobs)
+        self.fsync = fsync
+        # jobs=1 writes inline, exactly like the old loop
+        self.pool = None
+        if self.jobs > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            self.pool = ThreadPoolExecutor(max_workers=self.jobs)
+        # bound the number of rendered-but-unwritten batches held in memory
+        self.slots = threading.BoundedSemaphore(self.jobs * 4)
+        self.batch: list[tuple[str, bytes]] = []
+        self.results: list[list[WriteResult] | "Future"] = []
+        self.dirs: set[str] = set()
+        self.last: dict[str, "Future"] = {}   # path -> batch that writes it last
+        self.completed: list[WriteResult] = []   # what close() returned, for --stats
+
+    def _run(self, batch: list[tuple[str, bytes]]) -> list[WriteResult]:
+        results = []
+        for path, data in batch:
+            t0 = time.perf_counter()
+            try:
+                with open(path, "wb") as out:
+                    out.write(data)
+                    if self.fsync:
+                        out.flush()
+                        os.fsync(out.fileno())
+            except OSError as exc:
+                results.append(WriteResult(path, 0, time.perf_counter() - t0, exc))
+            else:
+                results.append(WriteResult(path, len(data), time.perf_counter() - t0, None))
+        return results
+
+    def _flush(self) -> None:
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        if self.pool is None:
+            self.results.append(self._run(batch))
+            return
+        # a path written again (e.g. a Rabbit favorite updated twice in one
+        # export) must not race its earlier batch: the last write wins
+        for path, _ in batch:
+            earlier = self.last.get(path)
+            if earlier is not None:
+                earlier.result()
+        self.slots.acquire()
+        fut = self.pool.submit(self._run, batch)
+        fut.add_done_callback(lambda _: self.slots.release())
+        self.results.append(fut)
+        for path, _ in batch:
+            self.last[path] = fut
+
+    def write(self, path, content: str) -> None:
+        path = str(path)
+        self.dirs.add(os.path.dirname(path) or ".")
+        self.batch.append((path, content.encode("utf-8")))
+        if self.pool is None or len(self.batch) >= BATCH_SIZE:
+            self._flush()
+
+    def close(self) -> list[WriteResult]:
+        self._flush()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        results = []
+        for r in self.results:
+            results.extend(r if isinstance(r, list) else r.result())
+        self.results, self.last = [], {}
+        if self.fsync:
+            # one fsync per directory makes the new entries durable in a batch
+            for d in sorted(self.dirs):
+                fsync_dir(d)
+        self.completed = results
+        return results
+
+def report_failures(results: list[WriteResult]) -> list[WriteResult]:
+    """Print one line per failed write (submission order) and return them."""
+    failed = [r for r in results if r.error is not None]
+    for r in failed:
+        print(f"Error: could not write {r.path}: {r.error.strerror or r.error}", file=sys.stderr)
+    return failed
+
+def add_writer_args(parser) -> None:
+    parser.add_argument("--write-jobs", type=int, default=DEFAULT_JOBS, metavar="N",
+                        help=f"Number of concurrent file writes (default: {DEFAULT_JOBS}; 1 writes inline)")
+    parser.add_argument("--fsync", action="store_true",
+                        help="fsync every written file and, once at the end, each target directory")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Read Remmina, PuTTY and Rabbit profiles back into a MobaXterm bookmarks export.
+
+The reverse of moba2remmina.py / moba2putty.py / moba2rabbit.py: each profile
+directory is listed with a single scandir pass and every profile is parsed as
+it is read, then the bookmarks are written as [Bookmarks_*] / SubRep= sections
+that MobaXterm (and the moba2* converters) can import.
+"""
+import os, sys, argparse
+from typing import Iterable, Iterator
+from urllib.parse import unquote
+
+from moba_common import SESSION_TYPES, Entry, moba_key_path
+from moba_store import EntryStore
+import moba2putty
+import moba2rabbit
+import moba2remmina
+
+SOURCES = ("remmina", "putty", "rabbit")
+
+# "#<icon>#<session type>" for the protocols the converters write; the icon is
+# cosmetic (MobaXterm lets users change it), the session type decides
+TYPE_CODES = {
+    "SSH": "#109#0",
+    "TELNET": "#98#1",
+    "RDP": "#91#4",
+    "VNC": "#128#5",
+    "SFTP": "#140#7",
+}
+DEFAULT_PORTS = {t.protocol: t.default_port for t in SESSION_TYPES.values()}
+
+def scan_files(directory: str, suffix: str = "") -> list[os.DirEntry]:
+    """Regular, non-hidden files of directory ending in suffix, in name order."""
+    try:
+        with os.scandir(directory) as it:
+            found = [d for d in it if d.name.endswith(suffix) and not d.name.startswith(".")
+                     and d.is_file()]
+    except FileNotFoundError:
+        return []
+    found.sort(key=lambda d: d.name)
+    return found
+
+def read_ini(path: str) -> dict[str, dict[str, str]]:
+    """{section: {key: value}} of a small ini-style file ("" for keys before any header)."""
+    sections: dict[str, dict[str, str]] = {"": {}}
+    current = sections[""]
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("[") and line.endswith("]"):
+                    current = sections.setdefault(line[1:-1], {})
+                elif "=" in line:
+                    key, value = line.split("=", 1)
+                    current.setdefault(key, value)
+    except OSError as exc:
+        print(f"Warning: could not read {path}: {exc.strerror or exc}", file=sys.stderr)
+        return {}
+    return sections
+
+def split_server(server: str) -> tuple[str, str]:
+    # "host:3389" -> ("host", "3389"); bare hosts and IPv6 addresses are kept whole
+    host, sep, port = server.rpartition(":")
+    if sep and port.isdigit() and ":" not in host:
+        return host, port
+    return server, ""
+
+def read_remmina(directory: str) -> Iterator[Entry]:
+    for d in scan_files(directory, ".remmina"):
+        p = read_ini(d.path).get("remmina")
+        if not p:
+            continue
+        protocol = p.get("protocol", "").upper()
+        if protocol not in moba2remmina.REMMINA_PROTOCOLS:
+            continue
+        group = p.get("group") or None
+        name = p.get("name") or d.name[:-len(".remmina")]
+        if group and name.startswith(f"{group}/"):
+            name = name[len(group) + 1:]   # moba2remmina shows "group/name"
+        host, port = split_server(p.get("server", ""))
+        yield Entry(
+            name=name,
+            protocol=protocol,
+            host=host,
+            port=p.get("port") or port or DEFAULT_PORTS[protocol],
+            user=p.get("username", ""),
+            key_path=p.get("ssh_privatekey", "") if p.get("ssh_auth", "1") != "0" else "",
+            group=group,
+        )
+
+def read_putty(directory: str) -> Iterator[Entry]:
+    for d in scan_files(directory):
+        name = unquote(d.name)
+        if name == "Default Settings":
+            continue
+        s = read_ini(d.path).get("", {})
+        protocol = s.get("Protocol", "ssh").upper()
+        if protocol not in ("SSH", "TELNET"):
+            continue
+        yield Entry(
+            name=s.get("_ImportedName") or name,
+            protocol=protocol,
+            host=s.get("HostName", ""),
+            port=s.get("PortNumber") or DEFAULT_PORTS[protocol],
+            user=s.get("UserName", ""),
+            key_path=s.get("PublicKeyFile", "") if protocol == "SSH" else "",
+            group=s.get("_ImportedGroup") or None,
+        )
+
+def read_rabbit(fav_ini: str, share_dir: str) -> Iterator[Entry]:
+    try:
+        with open(fav_ini, "r", encoding="utf-8", errors="ignore") as f:
+            fav = moba2rabbit.FavoriteIni(f.read())
+    except FileNotFoundError:
+        return
+    share_dir = os.path.abspath(share_dir)
+    present = {d.name for d in scan_files(share_dir, ".rrc")}
+    for idx in sorted(fav.fields):
+        path, fav_name = fav.get(idx, "File"), fav.get(idx, "Name")
+        if not path:
+            continue
+        if os.path.dirname(os.path.abspath(path)) == share_dir and os.path.basename(path) not in present:
+            continue
+        rrc = read_ini(path)
+        protocol = rrc.get("Plugin", {}).get("Protocol", "").upper()
+        if protocol not in ("SSH", "TELNET"):
+            continue
+        general, net, user = rrc.get("General", {}), rrc.get("Net", {}), rrc.get("User", {})
+        group = general.get("Group")
+        if not group:
+            desc = (fav.get(idx, "Descripte") or "").strip('"')
+            group = desc[len("Group: "):] if desc.startswith("Group: ") else None
+        yield Entry(
+            name=fav_name or general.get("Name", ""),
+            protocol=protocol,
+            host=net.get("Host", ""),
+            port=net.get("Port") or DEFAULT_PORTS[protocol],
+            user=user.get("Name", ""),
+            key_path=user.get("Authentication\\PublicKey\\File\\PrivateKey", "") if protocol == "SSH" else "",
+            group=group or None,
+        )
+
+def format_bookmark(e: Entry) -> str:
+    """One "Name=#icon#type%host%port%user%..." line (wide layout, SSH key at field 14)."""
+    key = moba_key_path(e.key_path) if e.protocol == "SSH" else ""
+    fields = [TYPE_CODES[e.protocol], e.host, e.port, e.user,
+              "", "-1", "-1", "", "", "", "", "0", "0", "0", key, "", "-1", "0", "0", "0"]
+    return f"{e.name}=" + "%".join(fields) + "%"
+
+class BookmarkSet:
+    """Bookmarks grouped by SubRep group, in first-seen order.
+
+    A bookmark read again from another client (moba2all writes every client)
+    is dropped; a different bookmark with a name already used in its group
+    gets a " (N)" suffix, since MobaXterm keys bookmarks by name. The
+    bookmarks themselves are kept in an EntryStore.
+    """
+
+    def __init__(self):
+        self.store = EntryStore()
+        self.groups: dict[str, dict[str, int]] = {"": {}}   # group -> name -> store row
+        self.seen: set[tuple] = set()
+        self.duplicates = 0
+        self.renames: list[tuple[str, str]] = []
+
+    def add(self, e: Entry) -> None:
+        ident = (e.group or "", e.name, e.protocol, e.host, e.port, e.user)
+        if ident in self.seen:
+            self.duplicates += 1
+            return
+        self.seen.add(ident)
+        names = self.groups.setdefault(e.group or "", {})
+        name, n = e.name, 2
+        while name in names:
+            name = f"{e.name} ({n})"
+            n += 1
+        if name != e.name:
+            self.renames.append((f"{e.group or ''}/{e.name}", name))
+            e = e._replace(name=name)
+        names[name] = self.store.append(e)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def lines(self) -> Iterator[str]:
+        n = 0
+        for group, rows in self.groups.items():
+            if group and not rows:
+                continue
+            if n:
+                yield ""
+            yield f"[Bookmarks_{n}]" if n else "[Bookmarks]"
+            yield f"SubRep={group}"
+            yield f"ImgNum={41 if group else 42}"
+            for e in self.store.rows(rows.values()):
+                yield format_bookmark(e)
+            n += 1
+
+def parse_sources(value: str) -> list[str]:
+    sources = [s.strip() for s in value.split(",") if s.strip()]
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown or not sources:
+        raise argparse.ArgumentTypeError(f"invalid sources {value!r} (choose from {', '.join(SOURCES)})")
+    return list(dict.fromkeys(sources))
+
+def read_sources(args) -> Iterable[tuple[str, Iterator[Entry]]]:
+    for s in args.sources:
+        if s == "remmina":
+            yield s, read_remmina(args.remmina_dir)
+        elif s == "putty":
+            yield s, read_putty(str(moba2putty.detect_target(args)))
+        elif s == "rabbit":
+            yield s, read_rabbit(args.rabbit_fav_ini, args.rabbit_share_dir)
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Export Remmina, PuTTY and Rabbit profiles as a MobaXterm bookmarks file."
+    )
+    ap.add_argument("-o", "--output", help="Write the export to this file (default: stdout)")
+    ap.add_argument("-s", "--sources", type=parse_sources, default=list(SOURCES),
+                    help="Comma-separated clients to read (default: remmina,putty,rabbit)")
+    ap.add_argument("--remmina-dir", default=moba2remmina.DEST_DIR,
+                    help=f"Remmina profile directory (default: {moba2remmina.DEST_DIR})")
+    # PuTTY directory selection; dest names match what moba2putty.detect_target() expects
+    ap.add_argument("--putty-target", dest="target", help="Override PuTTY sessions directory")
+    ap.add_argument("--putty-native", dest="native", action="store_true", help="Read the native PuTTY path")
+    ap.add_argument("--putty-flatpak", dest="flatpak", action="store_true", help="Read the Flatpak PuTTY path")
+    ap.add_argument("--rabbit-fav-ini", default=moba2rabbit.FAV_INI,
+                    help=f"Rabbit Favorite.ini (default: {moba2rabbit.FAV_INI})")
+    ap.add_argument("--rabbit-share-dir", default=moba2rabbit.SHARE_DIR,
+                    help=f"Rabbit .rrc directory (default: {moba2rabbit.SHARE_DIR})")
+    args = ap.parse_args()
+
+    bookmarks = BookmarkSet()
+    counts = {}
+    for source, entries in read_sources(args):
+        counts[source] = 0
+        for e in entries:
+            counts[source] += 1
+            bookmarks.add(e)
+    for ident, name in bookmarks.renames:
+        print(f"Renamed: {ident!r} -> {name!r} (name already used in its group)", file=sys.stderr)
+
+    # MobaXterm writes its exports with CRLF line endings
+    out = open(args.output, "w", encoding="utf-8", newline="\r\n") if args.output else sys.stdout
+    try:
+        for line in bookmarks.lines():
+            out.write(line + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    read = ", ".join(f"{s}: {n}" for s, n in counts.items())
+    groups = sum(1 for g, v in bookmarks.groups.items() if v)
+    print(f"Read {read}. Exported {len(bookmarks)} bookmarks in {groups} groups, "
+          f"Duplicates: {bookmarks.duplicates}.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()